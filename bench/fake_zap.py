@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+本地模拟 ZAP-Hosting 站点与 YesCaptcha 接口，用于离线基准测试
+
+模拟 ZapKeepAlive 实际走过的流程:
+1. 没有 cf_clearance 时返回 "Just a moment..." 质询页，数秒后自动通过并写入 cookie
+2. 首页 cookie 横幅、"Log in!" 链接、带 E-Mail/密码输入框的登录对话框
+3. /en/customer/home/ Dashboard (带 "Don't show again" 弹窗) 与 "My VPS" 入口
+4. /en/customer/vserver/id/<id>/ 详情页，显示 ONLINE/OFFLINE
+5. /createTask、/getTaskResult 模拟 YesCaptcha，解决耗时可配置
+
+单独运行:
+    python bench/fake_zap.py --port 8800
+"""
+
+import argparse
+import asyncio
+import secrets
+import time
+import zlib
+from aiohttp import web
+
+CHALLENGE_PAGE = '''<!DOCTYPE html>
+<html><head><title>Just a moment...</title></head>
+<body>
+<div class="main-wrapper" style="width:300px;height:65px;border:1px solid #ccc">Verify you are human</div>
+<script>
+setTimeout(() => fetch('/cdn-cgi/challenge-platform/verify', {method: 'POST'})
+    .then(() => location.reload()), %(delay_ms)d);
+</script>
+</body></html>'''
+
+HOME_PAGE = '''<!DOCTYPE html>
+<html><head><title>ZAP-Hosting</title>
+<link rel="stylesheet" href="/static/site.css">
+<style>.modal{display:none;position:fixed;top:80px;left:30%%;background:#fff;border:1px solid #333;padding:20px}</style>
+</head>
+<body>
+<div id="cookie-banner"><button onclick="this.parentNode.remove()">Accept all</button></div>
+<img src="/static/hero.jpg" width="600">
+<p>Already registered? <a href="#login" onclick="openLogin(); return false;">Log in!</a></p>
+<div class="modal" id="login-modal">
+  <div class="modal-body">
+    <input type="text" placeholder="E-Mail or Username" id="email">
+    <input type="password" placeholder="Password" id="password">
+    <textarea name="g-recaptcha-response" style="display:none"></textarea>
+    <div class="alert-danger" style="display:none"></div>
+    <button type="submit" onclick="submitLogin()">Login</button>
+  </div>
+</div>
+<script>
+function openLogin() {
+  setTimeout(() => { document.getElementById('login-modal').style.display = 'block'; }, %(modal_delay_ms)d);
+}
+if (location.hash === '#login') openLogin();
+async function submitLogin() {
+  const resp = await fetch('/api/login', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({
+      email: document.getElementById('email').value,
+      password: document.getElementById('password').value,
+      token: document.querySelector('textarea[name="g-recaptcha-response"]').value,
+    }),
+  });
+  if (resp.ok) {
+    location.href = '/en/customer/home/';
+  } else {
+    const alert = document.querySelector('.alert-danger');
+    alert.innerText = await resp.text();
+    alert.style.display = 'block';
+  }
+}
+</script>
+<script src="/static/tracker.js"></script>
+</body></html>'''
+
+DASHBOARD_PAGE = '''<!DOCTYPE html>
+<html><head><title>Dashboard - ZAP-Hosting</title>
+<link rel="stylesheet" href="/static/site.css">
+<style>.modal{position:fixed;top:80px;left:30%%;background:#fff;border:1px solid #333;padding:20px}</style>
+</head>
+<body>
+<div class="modal show" id="promo">
+  <p>New: Lifetime VPS upgrades</p>
+  <button onclick="document.getElementById('promo').remove()">Don't show again</button>
+  <button class="close" onclick="document.getElementById('promo').remove()">&times;</button>
+</div>
+<nav><a href="/en/customer/vserver/">My VPS</a></nav>
+<img src="/static/banner.jpg" width="600">
+%(content)s
+<script src="/static/tracker.js"></script>
+</body></html>'''
+
+
+class FakeZap:
+    def __init__(self, cf_delay: float = 2.0, captcha_latency: float = 5.0, page_latency: float = 0.05,
+                 modal_delay: float = 0.3, vps_per_account: int = 1, password: str = 'bench'):
+        self.cf_delay = cf_delay
+        self.captcha_latency = captcha_latency
+        self.page_latency = page_latency
+        self.modal_delay = modal_delay
+        self.vps_per_account = vps_per_account
+        self.password = password
+        self.sessions = {}  # zap_session -> email
+        self.tasks = {}  # taskId -> 创建时间
+        self.tokens = set()
+        self.stats = {'challenges': 0, 'logins': 0, 'captcha_tasks': 0, 'captcha_polls': 0, 'vps_views': 0}
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.latency, self.cloudflare])
+        app.router.add_get('/', lambda r: web.HTTPFound('/en/'))
+        app.router.add_get('/en/', self.home)
+        app.router.add_post('/cdn-cgi/challenge-platform/verify', self.verify)
+        app.router.add_post('/api/login', self.login)
+        app.router.add_get('/en/customer/home/', self.dashboard)
+        app.router.add_get('/en/customer/vserver/', self.vserver_list)
+        app.router.add_get('/en/customer/vserver/id/{vps_id}/', self.vserver_detail)
+        app.router.add_get('/static/{name}', self.static)
+        app.router.add_get('/ip', lambda r: web.Response(text='127.0.0.1'))
+        app.router.add_get('/stats', lambda r: web.json_response(self.stats))
+        app.router.add_post('/createTask', self.create_task)
+        app.router.add_post('/getTaskResult', self.get_task_result)
+        return app
+
+    @web.middleware
+    async def latency(self, request, handler):
+        if request.path.startswith('/en/'):
+            await asyncio.sleep(self.page_latency)
+        return await handler(request)
+
+    @web.middleware
+    async def cloudflare(self, request, handler):
+        if request.path.startswith('/en/') and 'cf_clearance' not in request.cookies:
+            self.stats['challenges'] += 1
+            return web.Response(status=403, content_type='text/html',
+                                text=CHALLENGE_PAGE % {'delay_ms': int(self.cf_delay * 1000)})
+        return await handler(request)
+
+    def current_user(self, request):
+        return self.sessions.get(request.cookies.get('zap_session', ''))
+
+    async def home(self, request):
+        return web.Response(content_type='text/html',
+                            text=HOME_PAGE % {'modal_delay_ms': int(self.modal_delay * 1000)})
+
+    async def verify(self, request):
+        response = web.Response(text='ok')
+        response.set_cookie('cf_clearance', secrets.token_hex(16), max_age=1800, path='/')
+        return response
+
+    async def login(self, request):
+        data = await request.json()
+        if data.get('token') not in self.tokens:
+            return web.Response(status=400, text='Please solve the captcha')
+        self.tokens.discard(data['token'])
+        if data.get('password') != self.password:
+            return web.Response(status=401, text='Wrong e-mail or password')
+        self.stats['logins'] += 1
+        sid = secrets.token_hex(16)
+        self.sessions[sid] = data.get('email')
+        response = web.Response(text='ok')
+        response.set_cookie('zap_session', sid, max_age=30 * 86400, path='/')
+        return response
+
+    def require_login(self, request):
+        email = self.current_user(request)
+        if not email:
+            raise web.HTTPFound('/en/#login')
+        return email
+
+    def vps_ids(self, email: str) -> list:
+        base = zlib.crc32(email.encode()) % 100000
+        return [base * 10 + i for i in range(self.vps_per_account)]
+
+    async def dashboard(self, request):
+        self.require_login(request)
+        return web.Response(content_type='text/html', text=DASHBOARD_PAGE % {'content': '<h1>Dashboard</h1>'})
+
+    async def vserver_list(self, request):
+        email = self.require_login(request)
+        links = ''.join(f'<li><a href="/en/customer/vserver/id/{vps_id}/">Lifetime VPS #{vps_id}</a></li>'
+                        for vps_id in self.vps_ids(email))
+        return web.Response(content_type='text/html', text=DASHBOARD_PAGE % {'content': f'<ul>{links}</ul>'})
+
+    async def vserver_detail(self, request):
+        email = self.require_login(request)
+        vps_id = int(request.match_info['vps_id'])
+        if vps_id not in self.vps_ids(email):
+            raise web.HTTPNotFound()
+        self.stats['vps_views'] += 1
+        content = (f'<h1>Lifetime VPS #{vps_id}</h1><div class="status">ONLINE</div>'
+                   f'<p>Expires: 2099-12-31</p>')
+        return web.Response(content_type='text/html', text=DASHBOARD_PAGE % {'content': content})
+
+    async def static(self, request):
+        # 模拟营销站点的图片、样式和第三方脚本体积
+        name = request.match_info['name']
+        if name.endswith('.jpg'):
+            return web.Response(body=b'\xff\xd8' + b'\0' * 200_000, content_type='image/jpeg')
+        if name.endswith('.css'):
+            return web.Response(text='body{font-family:sans-serif}' * 500, content_type='text/css')
+        return web.Response(text='/* tracker */' + ' ' * 50_000, content_type='application/javascript')
+
+    async def create_task(self, request):
+        self.stats['captcha_tasks'] += 1
+        task_id = secrets.token_hex(8)
+        self.tasks[task_id] = time.monotonic()
+        return web.json_response({'errorId': 0, 'taskId': task_id})
+
+    async def get_task_result(self, request):
+        self.stats['captcha_polls'] += 1
+        data = await request.json()
+        created = self.tasks.get(data.get('taskId'))
+        if created is None:
+            return web.json_response({'errorId': 1, 'errorDescription': 'ERROR_NO_SUCH_CAPCHA_ID'})
+        if time.monotonic() - created < self.captcha_latency:
+            return web.json_response({'errorId': 0, 'status': 'processing'})
+        token = f"FAKE-{secrets.token_hex(16)}"
+        self.tokens.add(token)
+        del self.tasks[data['taskId']]
+        return web.json_response({'errorId': 0, 'status': 'ready', 'solution': {'gRecaptchaResponse': token}})
+
+
+async def start(fake: FakeZap, host: str = '127.0.0.1', port: int = 0) -> tuple:
+    """启动模拟服务，返回 (runner, base_url)"""
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 ZAP-Hosting 与 YesCaptcha')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--cf-delay', type=float, default=2.0, help='Cloudflare 质询耗时(秒)')
+    parser.add_argument('--captcha-latency', type=float, default=5.0, help='验证码解决耗时(秒)')
+    parser.add_argument('--page-latency', type=float, default=0.05, help='页面响应延迟(秒)')
+    parser.add_argument('--vps', type=int, default=1, help='每个账号的 VPS 数量')
+    args = parser.parse_args()
+
+    fake = FakeZap(cf_delay=args.cf_delay, captcha_latency=args.captcha_latency,
+                   page_latency=args.page_latency, vps_per_account=args.vps)
+    print(f"模拟站点: http://127.0.0.1:{args.port}  (任意邮箱，密码 {fake.password})")
+    web.run_app(fake.app(), host='127.0.0.1', port=args.port, access_log=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+离线基准测试: 在本地模拟站点上运行 zap-renew.py，统计账号数从 1 增加到 N 时
+每个账号的耗时与整体吞吐
+
+每一档都以子进程方式完整运行一次 zap-renew.py (与定时任务一致)，从运行报告
+(ZAP_REPORT_DIR) 中读取各账号耗时。需要图形环境时与正式运行一样使用 xvfb-run:
+
+    xvfb-run python bench/run_bench.py --max-accounts 8 --concurrency 4
+
+默认每档使用全新的会话目录 (冷启动，每个账号都要登录)，--warm 则在同一目录
+上再跑一遍，测量会话有效时的耗时。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from fake_zap import FakeZap, start
+
+SCRIPT = Path(__file__).resolve().parent.parent / "zap-renew.py"
+
+
+def scale_steps(max_accounts: int) -> list:
+    steps, n = [], 1
+    while n < max_accounts:
+        steps.append(n)
+        n *= 2
+    steps.append(max_accounts)
+    return steps
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_once(base_url: str, n: int, args, session_dir: Path, report_dir: Path) -> dict:
+    accounts = ','.join(f"bench{i}@example.com:{FakeZap().password}" for i in range(n))
+    env = dict(os.environ,
+               ZAP_ACCOUNT=accounts,
+               ZAP_BASE_URL=base_url,
+               YESCAPTCHA_API_URL=base_url,
+               YESCAPTCHA_API_KEY='bench',
+               EGRESS_IP_URL=f"{base_url}/ip",
+               ZAP_SESSION_DIR=str(session_dir),
+               ZAP_REPORT_DIR=str(report_dir),
+               ZAP_CONCURRENCY=str(args.concurrency),
+               STAY_DURATION=str(args.stay))
+    for report in report_dir.glob('run-*.json'):
+        report.unlink()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(SCRIPT), env=env,
+        stdout=None if args.verbose else asyncio.subprocess.DEVNULL,
+        stderr=None if args.verbose else asyncio.subprocess.DEVNULL)
+    await proc.wait()
+    reports = sorted(report_dir.glob('run-*.json'))
+    if not reports:
+        raise RuntimeError(f"{n} 个账号的运行没有生成报告 (退出码 {proc.returncode})")
+    with open(reports[-1]) as f:
+        return json.load(f)
+
+
+def summarize(n: int, report: dict) -> dict:
+    durations = [a['duration'] for a in report['accounts'] if a['duration'] is not None]
+    wall = report['duration'] or 0
+    return {
+        'accounts': n,
+        'success': report['accounts_success'],
+        'wall': wall,
+        'per_minute': n / wall * 60 if wall else 0,
+        'p50': statistics.median(durations) if durations else 0,
+        'p95': percentile(durations, 95) if durations else 0,
+        'max': max(durations) if durations else 0,
+        'phase_seconds': report['phase_seconds'],
+        'counters': report['counters'],
+    }
+
+
+def print_table(title: str, rows: list):
+    print()
+    print(f"  {title}")
+    print("-" * 72)
+    print(f"  {'账号数':>6} {'成功':>6} {'总耗时(s)':>10} {'账号/分':>8} {'P50(s)':>8} {'P95(s)':>8} {'最大(s)':>8}")
+    for r in rows:
+        print(f"  {r['accounts']:>6} {r['success']:>6} {r['wall']:>10.1f} {r['per_minute']:>8.2f} "
+              f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['max']:>8.1f}")
+    print("-" * 72)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='zap-renew 离线基准测试')
+    parser.add_argument('--max-accounts', type=int, default=4, help='最大账号数，按 1,2,4... 递增')
+    parser.add_argument('--concurrency', type=int, default=1, help='ZAP_CONCURRENCY')
+    parser.add_argument('--stay', type=int, default=1, help='STAY_DURATION (秒)')
+    parser.add_argument('--cf-delay', type=float, default=2.0, help='模拟 Cloudflare 质询耗时(秒)')
+    parser.add_argument('--captcha-latency', type=float, default=5.0, help='模拟验证码解决耗时(秒)')
+    parser.add_argument('--page-latency', type=float, default=0.05, help='模拟页面响应延迟(秒)')
+    parser.add_argument('--vps', type=int, default=1, help='每个账号的 VPS 数量')
+    parser.add_argument('--warm', action='store_true', help='冷启动后在同一会话目录上再测一遍')
+    parser.add_argument('--json', help='把结果写入该 JSON 文件')
+    parser.add_argument('--verbose', action='store_true', help='显示 zap-renew.py 的输出')
+    args = parser.parse_args()
+
+    fake = FakeZap(cf_delay=args.cf_delay, captcha_latency=args.captcha_latency,
+                   page_latency=args.page_latency, vps_per_account=args.vps)
+    runner, base_url = await start(fake)
+    print(f"模拟站点: {base_url}")
+    results = {'cold': [], 'warm': []}
+    try:
+        with tempfile.TemporaryDirectory(prefix='zap-bench-') as tmp:
+            for n in scale_steps(args.max_accounts):
+                session_dir = Path(tmp) / f"sessions-{n}"
+                report_dir = Path(tmp) / f"reports-{n}"
+                print(f"[bench] {n} 个账号 (冷启动)...")
+                results['cold'].append(summarize(n, await run_once(base_url, n, args, session_dir, report_dir)))
+                if args.warm:
+                    print(f"[bench] {n} 个账号 (会话有效)...")
+                    results['warm'].append(summarize(n, await run_once(base_url, n, args, session_dir, report_dir)))
+    finally:
+        await runner.cleanup()
+
+    print_table(f"冷启动 (并发 {args.concurrency})", results['cold'])
+    if args.warm:
+        print_table(f"会话有效 (并发 {args.concurrency})", results['warm'])
+    print(f"  模拟站点统计: {fake.stats}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results, 'server': fake.stats}, f, indent=2)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
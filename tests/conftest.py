@@ -0,0 +1,22 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parent.parent / "zap-renew.py"
+
+
+@pytest.fixture(scope='session')
+def zap(tmp_path_factory):
+    """以模块方式加载 zap-renew.py，会话、报告目录指向临时目录；测试结束后恢复环境变量"""
+    tmp = tmp_path_factory.mktemp('zap')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('ZAP_SESSION_DIR', str(tmp / 'sessions'))
+        mp.setenv('ZAP_REPORT_DIR', '')
+        mp.setenv('ZAP_ENV_FILE', str(tmp / '.env'))
+        spec = importlib.util.spec_from_file_location('zap_renew', SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        mp.setitem(sys.modules, 'zap_renew', module)
+        spec.loader.exec_module(module)
+        yield module
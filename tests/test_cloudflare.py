@@ -0,0 +1,32 @@
+import asyncio
+
+
+def run_handle(zap, monkeypatch, states: list):
+    """按顺序返回给定的质询判断结果，记录计数与限速观测"""
+    counted, observed = [], []
+    monkeypatch.setattr(zap, 'count', lambda name, value=1: counted.append(name))
+    monkeypatch.setattr(zap, 'peak', lambda name, value: counted.append(name))
+    monkeypatch.setattr(zap.rate_limiter, 'observe', observed.append)
+    keeper = zap.ZapKeepAlive('t@example.com', 'p')
+    pending = list(states)
+
+    async def challenge_state(page):
+        return pending.pop(0) if pending else None
+    keeper.challenge_state = challenge_state
+    passed = asyncio.run(keeper._handle_cloudflare(1, page=None))
+    return passed, counted, observed
+
+
+def test_undetermined_then_normal_page_is_not_a_challenge(zap, monkeypatch):
+    passed, counted, observed = run_handle(zap, monkeypatch, [None, False])
+    assert passed is True
+    assert counted == ['cf_checks']
+    assert observed == [False]
+
+
+def test_undetermined_until_deadline_is_not_counted(zap, monkeypatch):
+    monkeypatch.setattr(zap, 'CF_ATTEMPT_SECONDS', 0.5)
+    passed, counted, observed = run_handle(zap, monkeypatch, [])
+    assert passed is False
+    assert counted == ['cf_checks']
+    assert observed == []
@@ -0,0 +1,32 @@
+import asyncio
+
+
+class FakeRequest:
+    def __init__(self, data: dict):
+        self.data = data
+
+    async def json(self):
+        return self.data
+
+
+def test_release_tracks_maintain_and_logs_failure(zap, monkeypatch):
+    logs = []
+    monkeypatch.setattr(zap.Logger, 'log', staticmethod(lambda step, msg, status='INFO', **fields:
+                                                        logs.append((status, msg))))
+
+    async def scenario():
+        daemon = zap.BrowserDaemon('chromium')
+        daemon.leases['abc'] = float('inf')
+
+        async def maintain():
+            raise RuntimeError("Chromium 启动失败")
+        daemon.maintain = maintain
+        await daemon.handle_release(FakeRequest({'lease': 'abc'}))
+        task = daemon._maintain_task
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)  # 让 done-callback 执行
+        return daemon, task
+
+    daemon, task = asyncio.run(scenario())
+    assert daemon.runs == 1 and task.done()
+    assert ('ERROR', '后台维护失败: Chromium 启动失败') in logs
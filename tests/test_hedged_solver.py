@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+
+class FakeProvider:
+    """按给定耗时返回 token 或抛出异常的打码平台，成功时与真实平台一样计入统计"""
+
+    def __init__(self, zap, name: str, delay: float, error: Exception = None):
+        self.zap, self.name, self.label = zap, name, name
+        self.delay, self.error = delay, error
+
+    async def solve_once(self, site_key: str, page_url: str) -> str:
+        await asyncio.sleep(self.delay)
+        if self.error:
+            self.zap.captcha_stats.record(self.name, False)
+            raise self.error
+        self.zap.captcha_stats.record(self.name, True, self.delay)
+        return f'token-{self.name}'
+
+
+@pytest.fixture
+def stats(zap, tmp_path, monkeypatch):
+    stats = zap.CaptchaStats(tmp_path / 'captcha.json')
+    monkeypatch.setattr(zap, 'captcha_stats', stats)
+    monkeypatch.setattr(zap, 'CAPTCHA_PROVIDER_ORDER', ['slow', 'fast'])
+    monkeypatch.setattr(zap, 'CAPTCHA_HEDGE', True)
+    monkeypatch.setattr(zap, 'CAPTCHA_HEDGE_AFTER', 0.05)
+    return stats
+
+
+def solve(zap, providers: list) -> str:
+    return asyncio.run(zap.HedgedSolver(providers).solve('key', 'https://example.com/'))
+
+
+def test_hedge_records_cancelled_attempt_as_lower_bound(zap, stats):
+    token = solve(zap, [FakeProvider(zap, 'slow', 5), FakeProvider(zap, 'fast', 0.05)])
+    assert token == 'token-fast'
+    slow = stats.data['slow']
+    assert slow['results'] == []
+    assert len(slow['latencies']) == 1 and slow['latencies'][0] >= 0.1
+
+
+def test_failure_switches_to_next_provider(zap, stats):
+    token = solve(zap, [FakeProvider(zap, 'slow', 0.01, RuntimeError('boom')), FakeProvider(zap, 'fast', 0.01)])
+    assert token == 'token-fast'
+    assert stats.data['slow'] == {'latencies': [], 'results': [False]}
+
+
+def test_all_providers_failing_raises(zap, stats):
+    with pytest.raises(Exception, match='所有打码平台均失败'):
+        solve(zap, [FakeProvider(zap, 'slow', 0.01, RuntimeError('a')),
+                    FakeProvider(zap, 'fast', 0.01, RuntimeError('b'))])
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from http.cookies import SimpleCookie
+
+from aiohttp import web
+
+
+def test_cookie_header_matches_domain_path_expiry_and_secure(zap):
+    now = time.time()
+    cookies = [
+        {'name': 'a', 'value': '1', 'domain': '.example.com', 'path': '/', 'expires': -1},
+        {'name': 'b', 'value': '2', 'domain': 'www.example.com', 'path': '/en/', 'expires': now + 60},
+        {'name': 'c', 'value': '3', 'domain': 'other.example.com', 'path': '/', 'expires': -1},
+        {'name': 'd', 'value': '4', 'domain': 'www.example.com', 'path': '/de/', 'expires': -1},
+        {'name': 'e', 'value': '5', 'domain': 'www.example.com', 'path': '/', 'expires': now - 60},
+        {'name': 'f', 'value': '6', 'domain': 'www.example.com', 'path': '/', 'expires': -1, 'secure': True},
+    ]
+    assert zap.cookie_header(cookies, 'https://www.example.com/en/x') == 'a=1; b=2; f=6'
+    assert zap.cookie_header(cookies, 'http://www.example.com/en/x') == 'a=1; b=2'
+
+
+def test_merge_set_cookies_updates_adds_and_deletes(zap):
+    cookies = [{'name': 'sid', 'value': 'old', 'domain': 'www.example.com', 'path': '/', 'expires': -1},
+               {'name': 'gone', 'value': 'x', 'domain': 'www.example.com', 'path': '/', 'expires': -1}]
+    jar = SimpleCookie()
+    jar.load('sid=new; Path=/; Max-Age=3600; HttpOnly')
+    jar.load('gone=; Path=/; Max-Age=0')
+    jar.load('cf_clearance=abc; Domain=.example.com; Path=/; Secure; SameSite=None')
+    zap.merge_set_cookies(cookies, SimpleNamespace(cookies=jar), 'https://www.example.com/en/')
+    by_name = {c['name']: c for c in cookies}
+    assert set(by_name) == {'sid', 'cf_clearance'}
+    assert by_name['sid']['value'] == 'new' and by_name['sid']['httpOnly']
+    assert by_name['sid']['expires'] > time.time()
+    assert by_name['cf_clearance']['domain'] == '.example.com' and by_name['cf_clearance']['secure']
+
+
+def test_parse_vps_html_ignores_scripts_styles_and_comments(zap):
+    html = ('<script>var i18n = {"state": "OFFLINE"};</script><style>.OFFLINE{}</style><!-- OFFLINE -->'
+            '<h1>VPS</h1><div>ONLINE</div><p>Expires: 2099-12-31</p>')
+    assert zap.parse_vps_html(html) == {'status': 'ONLINE', 'expires': '2099-12-31'}
+    assert zap.parse_vps_html('<script>x = "ONLINE"</script><p>nothing</p>')['status'] is None
+
+
+def run_fetch(zap, handler, path='/en/customer/vserver/id/1/'):
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            keeper = zap.ZapKeepAlive('t@example.com', 'p')
+            return await keeper.http_fetch_vps(f'http://127.0.0.1:{port}{path}', [])
+        finally:
+            await zap.close_http_session()
+            await runner.cleanup()
+    return asyncio.run(scenario())
+
+
+def test_password_field_on_detail_page_is_not_logout(zap):
+    async def handler(request):
+        return web.Response(content_type='text/html',
+                            text='<div>ONLINE</div><form><input type="password" name="root"></form>')
+    record, reason = run_fetch(zap, handler)
+    assert reason is None and record['status'] == 'ONLINE'
+
+
+def test_page_without_status_escalates_without_logout(zap):
+    async def handler(request):
+        return web.Response(content_type='text/html', text='<input type="password">')
+    assert run_fetch(zap, handler) == (None, 'unrecognized')
+
+
+def test_only_redirect_to_login_means_logged_out(zap):
+    async def to_login(request):
+        raise web.HTTPFound('/en/#login')
+    
+    async def elsewhere(request):
+        raise web.HTTPFound('/en/')
+    assert run_fetch(zap, to_login) == (None, 'login')
+    assert run_fetch(zap, elsewhere) == (None, 'redirect')
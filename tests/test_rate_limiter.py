@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+
+def test_bucket_unlimited_when_rate_zero(zap):
+    bucket = zap.TokenBucket(0, 1)
+
+    async def scenario():
+        return [await bucket.acquire() for _ in range(10)]
+    assert asyncio.run(scenario()) == [0.0] * 10
+
+
+def test_bucket_burst_then_refill(zap):
+    bucket = zap.TokenBucket(600, 2)  # 每秒 10 个
+
+    async def scenario():
+        return [await bucket.acquire() for _ in range(3)]
+    waits = asyncio.run(scenario())
+    assert waits[:2] == [pytest.approx(0, abs=0.01)] * 2
+    assert 0.08 <= waits[2] <= 0.2
+
+
+def test_bucket_factor_slows_refill(zap):
+    bucket = zap.TokenBucket(600, 1)
+    bucket.factor = 0.5
+
+    async def scenario():
+        return [await bucket.acquire() for _ in range(2)]
+    assert 0.18 <= asyncio.run(scenario())[1] <= 0.3
+
+
+@pytest.fixture
+def limiter(zap, monkeypatch):
+    monkeypatch.setattr(zap, 'CF_TARGET_RATE', 0.2)
+    monkeypatch.setattr(zap, 'CF_RATE_WINDOW', 10)
+    monkeypatch.setattr(zap, 'CF_RATE_MIN_SAMPLES', 5)
+    monkeypatch.setattr(zap, 'RATE_MIN_FACTOR', 0.25)
+    monkeypatch.setattr(zap, 'RATE_SLOWDOWN_COOLDOWN', 0)
+    monkeypatch.setattr(zap, 'RATE_RECOVERY_STEP', 0.25)
+    return zap.RateLimiter()
+
+
+def test_observe_needs_min_samples_before_slowing(zap, limiter):
+    for _ in range(4):
+        limiter.observe(True)
+    assert limiter.factor == 1.0
+    limiter.observe(True)
+    assert limiter.factor == 0.5
+    assert limiter.navigations.factor == limiter.logins.factor == 0.5
+
+
+def test_observe_never_below_min_factor(zap, limiter):
+    for _ in range(20):
+        limiter.observe(True)
+    assert limiter.factor == 0.25
+
+
+def test_observe_slowdown_cooldown(zap, limiter, monkeypatch):
+    monkeypatch.setattr(zap, 'RATE_SLOWDOWN_COOLDOWN', 3600)
+    for _ in range(10):
+        limiter.observe(True)
+    assert limiter.factor == 0.5
+
+
+def test_observe_recovers_when_rate_drops(zap, limiter):
+    for _ in range(5):
+        limiter.observe(True)
+    assert limiter.factor == 0.5
+    for _ in range(7):
+        limiter.observe(False)
+    # 窗口内质询率仍高于目标时不恢复
+    assert limiter.factor == 0.5
+    for _ in range(3):
+        limiter.observe(False)
+    # 降到目标以下后，每次未被质询的导航恢复一步
+    assert limiter.factor == 1.0
@@ -0,0 +1,41 @@
+import asyncio
+
+
+class FakeBrowser:
+    async def close(self):
+        pass
+
+
+def fake_keeper(zap, outcomes: dict):
+    """按邮箱依次返回 outcomes 中的结果的 ZapKeepAlive 替身"""
+    class FakeKeeper:
+        def __init__(self, email, password, token_pool=None):
+            self.email = email
+            self.retryable = True
+            self.vps_records = [{'id': '1', 'url': 'u', 'status': 'ONLINE', 'expires': None}]
+            self.vps_status = 'ONLINE'
+            self.trace = None
+            self.phase = None
+        
+        async def run(self, shared=None, attempt=0):
+            return outcomes[self.email].pop(0)
+    return FakeKeeper
+
+
+def test_ledger_records_final_result_once(zap, monkeypatch, tmp_path):
+    ledger = zap.RunLedger(tmp_path / 'ledger.json')
+    monkeypatch.setattr(zap, 'run_ledger', ledger)
+    monkeypatch.setattr(zap, 'ZapKeepAlive', fake_keeper(zap, {'a@x.com': [False, False, True],
+                                                              'b@x.com': [False, False, False]}))
+    monkeypatch.setattr(zap, 'SharedBrowser', FakeBrowser)
+    monkeypatch.setattr(zap, 'retry_delay', lambda attempt: 0)
+    monkeypatch.setattr(zap, 'MAX_RETRIES', 2)
+    monkeypatch.setattr(zap, 'RETRY_BUDGET', 5)
+    accounts = [{'email': 'a@x.com', 'password': 'p'}, {'email': 'b@x.com', 'password': 'p'}]
+    
+    results = asyncio.run(zap.run_accounts(accounts, 1))
+    
+    assert [r['success'] for r in results] == [True, False]
+    assert ledger.get('a@x.com')['failures'] == 0
+    assert ledger.get('a@x.com')['last_success'] is not None
+    assert ledger.get('b@x.com')['failures'] == 1
@@ -0,0 +1,70 @@
+import ast
+import json
+import re
+
+from conftest import SCRIPT
+
+# Playwright 的选择器引擎前缀 (text=、xpath= 等) 只能写在整个选择器开头，
+# 不能出现在逗号分隔的 CSS 列表中，否则解析失败 (Unexpected token "=")
+ENGINE_PREFIX = re.compile(r'^\s*(text|css|xpath|id|data-testid|internal:[\w-]+)\s*=')
+WAIT_METHODS = {'wait_visible', 'wait_for_selector', 'locator'}
+
+
+def split_css_list(selector: str) -> list:
+    """按顶层逗号拆分 (忽略引号与括号内的逗号)"""
+    parts, depth, quote, current = [], 0, None, ''
+    for ch in selector:
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in '"\'':
+            quote = ch
+        elif ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        current += ch
+    return parts + [current]
+
+
+def selector_literals() -> list:
+    tree = ast.parse(SCRIPT.read_text(encoding='utf-8'))
+    found = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in WAIT_METHODS and node.args
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            found.append((node.lineno, node.args[0].value))
+    return found
+
+
+def test_selector_lists_do_not_mix_engine_prefixes():
+    literals = selector_literals()
+    assert literals
+    for lineno, selector in literals:
+        parts = split_css_list(selector)
+        if len(parts) > 1:
+            bad = [p.strip() for p in parts if ENGINE_PREFIX.match(p)]
+            assert not bad, f"zap-renew.py:{lineno} 选择器列表中使用了引擎前缀: {bad}"
+
+
+def test_check_catches_engine_prefix_in_list():
+    assert ENGINE_PREFIX.match(split_css_list('button, text="Log in!"')[1])
+
+
+def test_fallback_candidate_never_remembered(zap, tmp_path):
+    memory = zap.SelectorMemory(tmp_path / 'selectors.json')
+    fallback = next(c['id'] for c in zap.PROBE_ROLES['email'] if c['fallback'])
+    memory.remember('email', fallback)
+    assert not (tmp_path / 'selectors.json').exists()
+    assert memory.ordered(['email'])['email'][-1]['id'] == fallback
+
+
+def test_fallback_candidate_stays_last_even_if_stored(zap, tmp_path):
+    fallback = next(c['id'] for c in zap.PROBE_ROLES['email'] if c['fallback'])
+    (tmp_path / 'selectors.json').write_text(json.dumps({'email': fallback}))
+    memory = zap.SelectorMemory(tmp_path / 'selectors.json')
+    assert memory.ordered(['email'])['email'][-1]['id'] == fallback
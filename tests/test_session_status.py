@@ -0,0 +1,47 @@
+import time
+
+
+def session(zap, cookies: list, verified_ago: float = 10) -> dict:
+    return {'storage_state': {'cookies': cookies, 'origins': []},
+            'meta': {'user_agent': zap.USER_AGENT, 'last_verified': time.time() - verified_ago},
+            'vps_urls': []}
+
+
+def cookie(zap, name: str, expires_in: float) -> dict:
+    domain = zap.urlsplit(zap.ZAP_BASE_URL).hostname
+    return {'name': name, 'value': 'x', 'domain': domain, 'path': '/', 'expires': time.time() + expires_in}
+
+
+def test_guessed_short_lived_cookie_expired_is_unknown(zap):
+    data = session(zap, [cookie(zap, 'zap_session', 30 * 86400), cookie(zap, 'XSRF-TOKEN', -60)])
+    assert zap.session_status(data) == 'unknown'
+
+
+def test_all_guessed_cookies_expired_is_dead(zap):
+    data = session(zap, [cookie(zap, 'zap_session', -60), cookie(zap, 'XSRF-TOKEN', -60)])
+    assert zap.session_status(data) == 'dead'
+
+
+def test_named_auth_cookie_expired_is_dead(zap, monkeypatch):
+    monkeypatch.setattr(zap, 'AUTH_COOKIE_NAMES', {'XSRF-TOKEN'})
+    data = session(zap, [cookie(zap, 'zap_session', 30 * 86400), cookie(zap, 'XSRF-TOKEN', -60)])
+    assert zap.session_status(data) == 'dead'
+
+
+def test_recently_verified_is_good(zap):
+    data = session(zap, [cookie(zap, 'zap_session', 30 * 86400)])
+    assert zap.session_status(data) == 'good'
+
+
+def test_legacy_vps_list_is_stale(zap, tmp_path):
+    path = tmp_path / 'legacy.json'
+    path.write_text('{"cookies": [], "vps_urls": ["https://h/en/customer/vserver/id/1/"]}')
+    assert zap.vps_list_stale(zap.read_session_file(path)['vps_discovered_at'])
+
+
+def test_vps_list_rediscover_ttl(zap, monkeypatch):
+    monkeypatch.setattr(zap, 'VPS_REDISCOVER_HOURS', 24)
+    assert not zap.vps_list_stale(time.time() - 3600)
+    assert zap.vps_list_stale(time.time() - 25 * 3600)
+    monkeypatch.setattr(zap, 'VPS_REDISCOVER_HOURS', 0)
+    assert not zap.vps_list_stale(0)
@@ -0,0 +1,60 @@
+import pytest
+
+
+@pytest.fixture
+def shards(zap, tmp_path, monkeypatch):
+    """结果目录指向临时目录，记录发送的通知"""
+    sent = []
+    monkeypatch.setattr(zap, 'RESULTS_DIR', tmp_path)
+    monkeypatch.setattr(zap, 'SHARD_COUNT', 2)
+    monkeypatch.setattr(zap, 'ACCOUNTS_STR', '')
+    monkeypatch.setattr(zap, 'notify_send', lambda title, content: sent.append((title, content)))
+
+    def write(index, results, **kwargs):
+        monkeypatch.setattr(zap, 'SHARD_INDEX', index)
+        zap.write_shard_results(results, **kwargs)
+    return write, sent
+
+
+def test_merge_all_skipped_sends_nothing(zap, shards):
+    write, sent = shards
+    write(0, [], skipped=True)
+    write(1, [], skipped=True)
+    assert zap.merge_shard_results() is True
+    assert sent == []
+
+
+def test_merge_notifies_when_any_shard_processed(zap, shards):
+    write, sent = shards
+    write(0, [], skipped=True)
+    write(1, [{'email': 'b@x.com', 'success': True}])
+    assert zap.merge_shard_results() is True
+    assert len(sent) == 1 and '1/1' in sent[0][1]
+
+
+def test_merge_missing_shard_still_notifies(zap, shards):
+    write, sent = shards
+    write(0, [], skipped=True)
+    assert zap.merge_shard_results() is False
+    assert len(sent) == 1
+
+
+def test_account_shard_is_stable_and_case_insensitive(zap):
+    assert zap.account_shard('User@X.com ', 4) == zap.account_shard('user@x.com', 4)
+    assert zap.account_shard('user@x.com', 4) == int(zap.hashlib.sha256(b'user@x.com').hexdigest(), 16) % 4
+
+
+def test_select_shard_partitions_accounts(zap):
+    accounts = [{'email': f'u{i}@x.com', 'password': 'p'} for i in range(20)]
+    parts = [zap.select_shard(accounts, i, 3) for i in range(3)]
+    assert sorted(a['email'] for part in parts for a in part) == sorted(a['email'] for a in accounts)
+
+
+def test_merge_follows_account_order(zap, shards, monkeypatch):
+    write, sent = shards
+    monkeypatch.setattr(zap, 'ACCOUNTS_STR', 'c@x.com:p,a@x.com:p,b@x.com:p')
+    write(0, [{'email': 'a@x.com', 'success': True}, {'email': 'b@x.com', 'success': True}])
+    write(1, [{'email': 'c@x.com', 'success': True}])
+    assert zap.merge_shard_results() is True
+    body = sent[0][1]
+    assert body.index('c@x.com') < body.index('a@x.com') < body.index('b@x.com')
@@ -0,0 +1,41 @@
+import asyncio
+
+
+class FakeSolver:
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+    
+    async def solve(self, site_key: str, page_url: str) -> str:
+        self.calls += 1
+        token = f"t{self.calls}"
+        await asyncio.sleep(self.delay)
+        return token
+
+
+def test_more_waiters_than_inflight_tasks(zap):
+    async def scenario():
+        solver = FakeSolver()
+        pool = zap.CaptchaTokenPool(solver, 'key', 'url', expected=1, max_inflight=2)
+        pool.start()
+        tokens = await asyncio.wait_for(asyncio.gather(pool.acquire(), pool.acquire()), 2)
+        await pool.close()
+        return tokens, solver.calls
+    
+    tokens, calls = asyncio.run(scenario())
+    assert sorted(tokens) == ['t1', 't2']
+    assert calls == 2
+
+
+def test_refill_ignores_finished_tasks(zap):
+    async def scenario():
+        solver = FakeSolver()
+        pool = zap.CaptchaTokenPool(solver, 'key', 'url', expected=3, max_inflight=1)
+        pool.start()
+        tokens = [await asyncio.wait_for(pool.acquire(), 2) for _ in range(3)]
+        await pool.close()
+        return tokens, pool.stats
+    
+    tokens, stats = asyncio.run(scenario())
+    assert len(set(tokens)) == 3
+    assert stats['used'] == 3
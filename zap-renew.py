@@ -13,32 +13,247 @@ new Env('zap-renew')
 5. 停留指定时间后刷新
 6. 保存会话供下次使用
 
-环境变量:
-    ZAP_ACCOUNT: 账号配置，格式: 邮箱:密码,邮箱2:密码2
+用法:
+    zap-renew.py [run]      处理全部账号 (默认)
+    zap-renew.py check      不启动浏览器检查配置、账号与会话状态
+    zap-renew.py sessions   列出会话目录中的全部会话
+    zap-renew.py daemon     启动常驻浏览器服务
+    zap-renew.py merge      汇总分片结果并发送通知
+
+环境变量 (也可写在脚本目录下的 .env 中):
+    ZAP_ACCOUNT: 账号配置 (也可用 ACCOUNTS_ZAP 或 ACCOUNTS)，格式: 邮箱:密码,邮箱2:密码2
     YESCAPTCHA_API_KEY: YesCaptcha API密钥
     STAY_DURATION: 停留时间(秒)，默认10
+    ZAP_CONCURRENCY: 并发账号数，默认1 (逐个处理)
+    ZAP_DAEMON_URL: 常驻浏览器服务地址 (可选，服务用 `zap-renew.py daemon` 启动)
 """
 
 import os
+import argparse
 import asyncio
 import json
 import time
-import requests
+import atexit
+import hashlib
+import heapq
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import secrets
+import shutil
+import signal
+import sys
+import tempfile
+import contextvars
+import importlib.util
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
 from pathlib import Path
+from urllib.parse import urlsplit, urljoin
+from email.utils import parsedate_to_datetime
 from datetime import datetime
-from playwright.async_api import async_playwright
+# playwright 与 aiohttp 导入较慢，在需要时才导入 (check 等子命令不需要)
+
+
+def load_env_file(path: Path):
+    """读取 .env (KEY=VALUE，# 开头为注释)，已设置的环境变量优先"""
+    if not path.is_file():
+        return
+    for line in path.read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        key = key.strip().removeprefix('export ').strip()
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+            value = value[1:-1]
+        os.environ.setdefault(key, value)
+
+
+load_env_file(Path(os.environ.get('ZAP_ENV_FILE', str(Path(__file__).parent / ".env"))))
 
 # ==================== 从环境变量加载配置 ====================
 YESCAPTCHA_API_KEY = os.environ.get('YESCAPTCHA_API_KEY', '')
-YESCAPTCHA_API_URL = "https://api.yescaptcha.com"
+YESCAPTCHA_API_URL = os.environ.get('YESCAPTCHA_API_URL', "https://api.yescaptcha.com")
+# 验证码轮询: 首次等待、初始间隔、间隔增长倍数、最大间隔、总超时 (秒)
+CAPTCHA_POLL_INITIAL = float(os.environ.get('CAPTCHA_POLL_INITIAL', '5'))
+CAPTCHA_POLL_INTERVAL = float(os.environ.get('CAPTCHA_POLL_INTERVAL', '1.5'))
+CAPTCHA_POLL_BACKOFF = float(os.environ.get('CAPTCHA_POLL_BACKOFF', '1.5'))
+CAPTCHA_POLL_MAX = float(os.environ.get('CAPTCHA_POLL_MAX', '5'))
+CAPTCHA_MAX_WAIT = int(os.environ.get('CAPTCHA_MAX_WAIT', '120'))
+CAPTCHA_POOL_SIZE = 10
+# 其他兼容 createTask/getTaskResult 接口的打码平台，配置了密钥即启用
+CAPSOLVER_API_KEY = os.environ.get('CAPSOLVER_API_KEY', '')
+TWOCAPTCHA_API_KEY = os.environ.get('TWOCAPTCHA_API_KEY', '')
+ANTICAPTCHA_API_KEY = os.environ.get('ANTICAPTCHA_API_KEY', '')
+# 平台优先顺序 (逗号分隔)，留空则按历史耗时与成功率自动选择
+CAPTCHA_PROVIDER_ORDER = [n.strip() for n in os.environ.get('CAPTCHA_PROVIDERS', '').split(',') if n.strip()]
+# 对冲: 首选平台耗时超过其历史耗时的该百分位后，同时向下一个平台提交，取先返回的 token；
+# 样本不足时按 CAPTCHA_HEDGE_AFTER 秒。CAPTCHA_HEDGE=0 只在失败时切换
+CAPTCHA_HEDGE = os.environ.get('CAPTCHA_HEDGE', '1') == '1'
+CAPTCHA_HEDGE_PERCENTILE = float(os.environ.get('CAPTCHA_HEDGE_PERCENTILE', '90'))
+CAPTCHA_HEDGE_AFTER = float(os.environ.get('CAPTCHA_HEDGE_AFTER', '60'))
+# 每个平台保留最近多少次结果用于统计、至少多少个样本才参与排序与百分位计算
+CAPTCHA_STATS_WINDOW = 50
+CAPTCHA_STATS_MIN_SAMPLES = 5
+# 等待策略: 默认按页面事件等待 (URL 变化、元素可见、网络空闲)，
+# ZAP_CONSERVATIVE_WAITS=1 恢复原来的固定延时
+CONSERVATIVE_WAITS = os.environ.get('ZAP_CONSERVATIVE_WAITS', '0') == '1'
+WAIT_TIMEOUT = float(os.environ.get('ZAP_WAIT_TIMEOUT', '15'))
+LOGIN_TIMEOUT = float(os.environ.get('ZAP_LOGIN_TIMEOUT', '35'))
+# reCAPTCHA token 预取: 开关、同时预取上限(默认取并发数与 ZAP_LOGIN_CONCURRENCY 中较小的)、token 有效期(秒，官方约120秒)
+CAPTCHA_PREFETCH = os.environ.get('CAPTCHA_PREFETCH', '1') == '1'
+CAPTCHA_PREFETCH_MAX = int(os.environ.get('CAPTCHA_PREFETCH_MAX', '0'))
+CAPTCHA_TOKEN_TTL = int(os.environ.get('CAPTCHA_TOKEN_TTL', '110'))
+# Cloudflare: 复用已获得的 cf_clearance (按 UA + 出口 IP 区分)、查询出口 IP 的地址、质询时点击间隔(秒)
+CF_CLEARANCE_REUSE = os.environ.get('CF_CLEARANCE_REUSE', '1') == '1'
+EGRESS_IP_URL = os.environ.get('EGRESS_IP_URL', 'https://api.ipify.org')
+CF_CLICK_INTERVAL = float(os.environ.get('CF_CLICK_INTERVAL', '4'))
+CF_ATTEMPT_SECONDS = 3
+# 网络过滤: 拦截非必要资源类型与第三方域名，ZAP_NET_FILTER=0 关闭
+# 允许列表中的域名 (Cloudflare、reCAPTCHA、常用 CDN) 与站点自身域名的脚本始终放行
+NET_FILTER = os.environ.get('ZAP_NET_FILTER', '1') == '1'
+BLOCK_RESOURCE_TYPES = {t.strip() for t in os.environ.get('ZAP_BLOCK_RESOURCES', 'image,media,font').split(',') if t.strip()}
+BLOCK_HOSTS = ['googletagmanager.com', 'google-analytics.com', 'doubleclick.net', 'facebook.net',
+               'facebook.com', 'hotjar.com', 'clarity.ms', 'tawk.to', 'intercom.io', 'zdassets.com',
+               'trustpilot.com', 'bing.com', 'criteo.com', 'taboola.com'] + \
+              [h.strip() for h in os.environ.get('ZAP_BLOCK_HOSTS', '').split(',') if h.strip()]
+ALLOW_HOSTS = ['challenges.cloudflare.com', 'cdnjs.cloudflare.com', 'www.google.com', 'www.gstatic.com',
+               'recaptcha.net', 'cdn.jsdelivr.net'] + \
+              [h.strip() for h in os.environ.get('ZAP_ALLOW_HOSTS', '').split(',') if h.strip()]
+# 被拦截请求的估算体积 (字节)，仅用于报告节省量
+BLOCKED_SIZE_ESTIMATE = {'image': 40_000, 'media': 500_000, 'font': 40_000, 'script': 60_000,
+                         'stylesheet': 20_000, 'document': 50_000}
 
-ACCOUNTS_STR = os.environ.get('ZAP_ACCOUNT', '')
+# 账号配置，兼容青龙面板文档中的 ACCOUNTS_ZAP 与 .env / 工作流中的 ACCOUNTS
+ACCOUNT_ENV_NAMES = ('ZAP_ACCOUNT', 'ACCOUNTS_ZAP', 'ACCOUNTS')
+ACCOUNTS_ENV = next((name for name in ACCOUNT_ENV_NAMES if os.environ.get(name)), None)
+ACCOUNTS_STR = os.environ.get(ACCOUNTS_ENV, '') if ACCOUNTS_ENV else ''
 STAY_DURATION = int(os.environ.get('STAY_DURATION', '10'))
+# 并发账号数，1 为逐个处理 (每个账号独立启动浏览器)
+ZAP_CONCURRENCY = max(1, int(os.environ.get('ZAP_CONCURRENCY', '1')))
+
+# 失败重试: 每个账号最多重试次数、首次重试延迟(秒，指数增长并加随机抖动)、延迟上限、整次运行的重试总数上限
+MAX_RETRIES = int(os.environ.get('ZAP_MAX_RETRIES', '2'))
+RETRY_DELAY = float(os.environ.get('ZAP_RETRY_DELAY', '30'))
+RETRY_MAX_DELAY = 300
+RETRY_BUDGET = int(os.environ.get('ZAP_RETRY_BUDGET', '5'))
+# 断点: 已完成的账号写入 checkpoint 文件，运行被中断后在该小时数内重跑只处理未完成的账号
+CHECKPOINT_TTL_HOURS = float(os.environ.get('ZAP_CHECKPOINT_TTL_HOURS', '6'))
+
+# 限速 (同一出口 IP 的全部账号共用): 每分钟最多导航次数与登录次数 (0 为不限)、同时处于登录/打码阶段的账号数、
+# 并发模式下每个账号开始前的随机延迟上限(秒)，避免多个账号同时打到 Cloudflare
+NAV_PER_MIN = float(os.environ.get('ZAP_NAV_PER_MIN', '30'))
+NAV_BURST = 5
+LOGIN_PER_MIN = float(os.environ.get('ZAP_LOGIN_PER_MIN', '4'))
+LOGIN_BURST = 2
+LOGIN_CONCURRENCY = max(1, int(os.environ.get('ZAP_LOGIN_CONCURRENCY', '2')))
+START_JITTER = float(os.environ.get('ZAP_START_JITTER', '5'))
+# 自动降速 (AIMD): 最近若干次导航中被 Cloudflare 质询的比例超过 ZAP_CF_TARGET_RATE 时速率减半
+# (最低 1/8，间隔至少 30 秒)，之后每次未被质询的导航恢复 10%
+CF_TARGET_RATE = float(os.environ.get('ZAP_CF_TARGET_RATE', '0.3'))
+CF_RATE_WINDOW = 20
+CF_RATE_MIN_SAMPLES = 5
+RATE_MIN_FACTOR = 0.125
+RATE_SLOWDOWN_COOLDOWN = 30
+RATE_RECOVERY_STEP = 0.1
+
+# 日志格式: human (默认，每行带时间、账号与阶段) 或 json (每行一个 JSON 对象，供外部工具解析进度与结果)
+LOG_FORMAT = os.environ.get('ZAP_LOG_FORMAT', 'human')
+# 停留期间输出剩余时间的间隔(秒)
+STAY_LOG_INTERVAL = 30
+
+# HTTP 快速路径: 有缓存的 VPS 地址且会话未失效时，先不启动浏览器，直接用保存的 cookie 请求详情页；
+# 遇到 Cloudflare 质询或登录跳转才改用浏览器。ZAP_HTTP_STAY 为请求后停留再刷新的秒数 (默认不停留)
+HTTP_FAST_PATH = os.environ.get('ZAP_HTTP_FAST_PATH', '1') == '1'
+HTTP_STAY = float(os.environ.get('ZAP_HTTP_STAY', '0'))
 
-LOGIN_URL = "https://zap-hosting.com/en/#login"
-DASHBOARD_URL = "https://zap-hosting.com/en/customer/home/"
-SESSION_DIR = Path(__file__).parent / "sessions"
+# 分片: 多个 runner 各处理一部分账号 (按邮箱哈希确定性划分)，各自写入 shard-<序号>.json，
+# 最后由 `zap-renew.py merge` 汇总并发送一条通知
+SHARD_INDEX = int(os.environ.get('ZAP_SHARD_INDEX', '0'))
+SHARD_COUNT = max(1, int(os.environ.get('ZAP_SHARD_COUNT', '1')))
+RESULTS_DIR = Path(os.environ.get('ZAP_RESULTS_DIR', str(Path(__file__).parent / "results")))
+
+# 常驻浏览器服务: 设置 ZAP_DAEMON_URL 后通过 CDP 连接 `zap-renew.py daemon` 预热好的 Chromium，
+# 服务不可用时回退到本地启动
+DAEMON_URL = os.environ.get('ZAP_DAEMON_URL', '').rstrip('/')
+DAEMON_PORT = int(os.environ.get('ZAP_DAEMON_PORT', '9330'))
+DAEMON_CDP_PORT = int(os.environ.get('ZAP_DAEMON_CDP_PORT', '9331'))
+# 服务端 Chromium 配置目录 (留空则每次启动使用临时目录)、运行多少次或内存超过多少 MB 后空闲时回收
+DAEMON_PROFILE = os.environ.get('ZAP_DAEMON_PROFILE', '')
+DAEMON_MAX_RUNS = int(os.environ.get('ZAP_DAEMON_MAX_RUNS', '20'))
+DAEMON_MAX_RSS_MB = int(os.environ.get('ZAP_DAEMON_MAX_RSS_MB', '800'))
+# 客户端异常退出未归还时，租约在该秒数后自动失效
+DAEMON_LEASE_SECONDS = 1800
+
+# 站点地址可覆盖，用于 bench/ 下的本地模拟站点
+ZAP_BASE_URL = os.environ.get('ZAP_BASE_URL', "https://zap-hosting.com").rstrip('/')
+LOGIN_URL = f"{ZAP_BASE_URL}/en/#login"
+DASHBOARD_URL = f"{ZAP_BASE_URL}/en/customer/home/"
+SESSION_DIR = Path(os.environ.get('ZAP_SESSION_DIR', str(Path(__file__).parent / "sessions")))
+CF_CLEARANCE_FILE = SESSION_DIR / "cf_clearance.json"
+SELECTOR_MEMORY_FILE = SESSION_DIR / "selectors.json"
+CAPTCHA_STATS_FILE = SESSION_DIR / "captcha_stats.json"
+LEDGER_FILE = SESSION_DIR / "ledger.json"
+CHECKPOINT_FILE = SESSION_DIR / (f"checkpoint-{SHARD_INDEX}.json" if SHARD_COUNT > 1 else "checkpoint.json")
+# 距上次成功保活不足该小时数的账号本次跳过 (上次失败的始终处理)，0 为每次都处理全部账号
+MIN_INTERVAL_HOURS = float(os.environ.get('ZAP_MIN_INTERVAL_HOURS', '0'))
+# 运行报告: JSON 报告目录 (留空关闭)、Prometheus textfile 路径 (可选)
+REPORT_DIR = os.environ.get('ZAP_REPORT_DIR', str(Path(__file__).parent / "reports"))
+PROM_FILE = os.environ.get('ZAP_PROM_FILE', '')
+# 会话文件超过该天数视为可能失效 (用于预估登录次数)
+SESSION_STALE_DAYS = float(os.environ.get('SESSION_STALE_DAYS', '7'))
+# 最近一次确认会话有效后的信任时长(小时)，期间跳过 Dashboard 探测
+SESSION_TRUST_HOURS = float(os.environ.get('ZAP_SESSION_TRUST_HOURS', '72'))
+# 缓存的 VPS 列表超过该小时数后从 Dashboard 重新查找 (每次重新登录后也会重新查找)，0 为仅在登录后查找
+VPS_REDISCOVER_HOURS = float(os.environ.get('ZAP_VPS_REDISCOVER_HOURS', '24'))
+# 登录态 cookie 名称 (逗号分隔)，留空则按站点自身域名下的非统计类 cookie 推断
+AUTH_COOKIE_NAMES = {n.strip() for n in os.environ.get('ZAP_AUTH_COOKIES', '').split(',') if n.strip()}
+NON_AUTH_COOKIE_PREFIXES = ('cf_', '__cf', '_ga', '_gid', '_gcl', '_fbp', '_hj', 'cookie', 'CookieConsent')
 RECAPTCHA_SITEKEY = "6Lc8WwosAAAAABY42gdwB6ShcYBPW_YHTQeIhjav"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+HTTP_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate',
+}
+VPS_STATUS_RE = re.compile(r'\b(ONLINE|OFFLINE)\b')
+VPS_EXPIRES_RE = re.compile(r'(?:expires?|expiry|expiration|valid until|paid until)\s*(?:on|at)?\s*:?\s*'
+                            r'(\d{1,4}[./-]\d{1,2}[./-]\d{1,4})', re.I)
+BROWSER_ARGS = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-blink-features=AutomationControlled']
+# 低内存模式: 面向 512MB~1GB 的容器，限制渲染进程数、关闭 GPU/扩展/后台网络，使用较小视口
+LOW_MEMORY = os.environ.get('ZAP_LOW_MEMORY', '0') == '1'
+LOW_MEMORY_ARGS = ['--renderer-process-limit=1', '--disable-site-isolation-trials',
+                   '--disable-gpu', '--disable-extensions', '--disable-background-networking',
+                   '--disable-component-update', '--disable-default-apps', '--disable-sync', '--mute-audio',
+                   '--js-flags=--max-old-space-size=192']
+# 只在常驻服务直接启动 Chromium 时传入: Playwright 启动时自带一个 --disable-features 列表，
+# Chromium 只认最后一个，再传会让它关闭的功能重新生效
+LOW_MEMORY_DISABLED_FEATURES = 'IsolateOrigins,site-per-process,Translate,BackForwardCache,MediaRouter,OptimizationHints'
+# 新版无头模式 (--headless=new，不需要 xvfb)，低内存模式下默认开启；Cloudflare 不放行时设为 0 退回 xvfb
+HEADLESS = os.environ.get('ZAP_HEADLESS', '1' if LOW_MEMORY else '0') == '1'
+VIEWPORT = {'width': 1024, 'height': 700} if LOW_MEMORY else {'width': 1280, 'height': 900}
+# 同一账号同时打开的 VPS 详情页数 (含主页面)，多个 VPS 时其余的在新标签页中并行保活
+VPS_TABS = max(1, int(os.environ.get('ZAP_VPS_TABS', '2' if LOW_MEMORY else '4')))
+# 每个账号运行期间采样本进程树 (含浏览器) 内存的间隔(秒)，记录峰值用于评估并发数
+RSS_SAMPLE_INTERVAL = 1
+
+
+def browser_args(direct: bool = False) -> list:
+    """direct 为 True 表示不经 Playwright 直接启动 Chromium (常驻浏览器服务)"""
+    args = list(BROWSER_ARGS)
+    if LOW_MEMORY:
+        args += LOW_MEMORY_ARGS
+        if direct:
+            args.append(f'--disable-features={LOW_MEMORY_DISABLED_FEATURES}')
+    if HEADLESS:
+        # 由参数指定而不是 headless=True，后者使用旧版无头内核，更容易被 Cloudflare 识别
+        args.append('--headless=new')
+    return args
 
 
 def parse_accounts(accounts_str: str) -> list:
@@ -53,206 +268,1557 @@ def parse_accounts(accounts_str: str) -> list:
     return accounts
 
 
+def account_shard(email: str, shard_count: int) -> int:
+    """账号所属分片，按邮箱 sha256 取模，与账号顺序和 Python 哈希种子无关"""
+    digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+    return int(digest, 16) % shard_count
+
+
+def select_shard(accounts: list, shard_index: int, shard_count: int) -> list:
+    return [a for a in accounts if account_shard(a['email'], shard_count) == shard_index]
+
+
 def get_session_file(email: str) -> Path:
-    SESSION_DIR.mkdir(exist_ok=True)
+    SESSION_DIR.mkdir(parents=True, exist_ok=True)
     safe_name = email.replace('@', '_at_').replace('.', '_')
     return SESSION_DIR / f"{safe_name}.json"
 
 
-# 青龙通知
-try:
-    from notify import send as notify_send
-except ImportError:
-    def notify_send(title, content): print(f"[通知] {title}: {content}")
+def read_session_file(session_file: Path) -> dict:
+    """
+    读取会话文件: {storage_state, meta, vps_urls}
+    兼容旧版只保存 cookie 列表、以及 {cookies, vps_urls} 的格式
+    """
+    with open(session_file) as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {'cookies': data}
+    if 'storage_state' not in data:
+        data['storage_state'] = {'cookies': data.pop('cookies', []), 'origins': []}
+    data.setdefault('meta', {})
+    data.setdefault('vps_urls', [])
+    data.setdefault('vps_discovered_at', 0)
+    return data
+
+
+def vps_list_stale(discovered_at: float) -> bool:
+    """缓存的 VPS 列表是否需要重新查找 (旧版会话没有查找时间，按过期处理)"""
+    if VPS_REDISCOVER_HOURS <= 0:
+        return False
+    return time.time() - discovered_at > VPS_REDISCOVER_HOURS * 3600
+
+
+def load_session_data(session_file: Path):
+    """读取会话文件，不存在或损坏时返回 None"""
+    if not session_file.exists():
+        return None
+    try:
+        return read_session_file(session_file)
+    except Exception as e:
+        Logger.log("会话", f"会话文件损坏，忽略: {e}", "WARN")
+        return None
+
+
+def session_status(data) -> str:
+    """
+    根据会话元数据判断: 'dead' 确定失效、'good' 近期确认有效、'unknown' 需要探测
+    """
+    if not data:
+        return 'dead'
+    now = time.time()
+    cookies = auth_cookies(data['storage_state'].get('cookies', []))
+    if not cookies:
+        return 'dead'
+    expiry = auth_cookie_expiry(cookies)
+    if expiry is not None and expiry <= now:
+        # ZAP_AUTH_COOKIES 指定了名称时可以确定失效；推断出的集合可能混有短期 cookie (如 XSRF-TOKEN)，
+        # 只有全部过期才算失效，否则交给探测确认
+        if AUTH_COOKIE_NAMES or all(0 < c.get('expires', -1) <= now for c in cookies):
+            return 'dead'
+        return 'unknown'
+    meta = data['meta']
+    if meta.get('user_agent') and meta['user_agent'] != USER_AGENT:
+        return 'unknown'
+    if now - meta.get('last_verified', 0) < SESSION_TRUST_HOURS * 3600:
+        return 'good'
+    return 'unknown'
+
+
+def session_likely_stale(session_file: Path) -> bool:
+    """粗略判断账号本次是否需要登录: 会话已确定失效，或状态未知且文件已很旧"""
+    data = load_session_data(session_file)
+    status = session_status(data)
+    if status != 'unknown':
+        return status == 'dead'
+    saved_at = data['meta'].get('saved_at') or session_file.stat().st_mtime
+    return time.time() - saved_at > SESSION_STALE_DAYS * 86400
+
+
+def write_text_atomic(path: Path, text: str):
+    """先写临时文件再 rename，进程中途被杀也不会留下半截文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_json_atomic(path: Path, data):
+    write_text_atomic(path, json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def host_matches(host: str, patterns: list) -> bool:
+    return any(host == p or host.endswith('.' + p) for p in patterns)
+
+
+def block_reason(url: str, resource_type: str):
+    """返回拦截原因 ('host'/'third_party'/'type')，放行返回 None"""
+    host = urlsplit(url).hostname or ''
+    if not host or host_matches(host, ALLOW_HOSTS):
+        return None
+    if host_matches(host, BLOCK_HOSTS):
+        return 'host'
+    site_host = urlsplit(ZAP_BASE_URL).hostname or ''
+    if not host_matches(host, [site_host.removeprefix('www.')]):
+        return 'third_party'
+    if resource_type in BLOCK_RESOURCE_TYPES:
+        return 'type'
+    return None
+
+
+def auth_cookies(cookies: list) -> list:
+    site_host = (urlsplit(ZAP_BASE_URL).hostname or '').removeprefix('www.')
+    result = []
+    for c in cookies:
+        if not host_matches(c.get('domain', '').lstrip('.'), [site_host]):
+            continue
+        if AUTH_COOKIE_NAMES:
+            if c['name'] in AUTH_COOKIE_NAMES:
+                result.append(c)
+        elif not c['name'].startswith(NON_AUTH_COOKIE_PREFIXES):
+            result.append(c)
+    return result
+
+
+def auth_cookie_expiry(cookies: list):
+    """登录态 cookie 中最早的过期时间，全是会话 cookie 时返回 None"""
+    expiries = [c['expires'] for c in auth_cookies(cookies) if c.get('expires', -1) > 0]
+    return min(expiries) if expiries else None
+
+
+def cookie_header(cookies: list, url: str) -> str:
+    """按域名、路径、过期时间与 secure 属性从 storage state 的 cookie 中挑出请求 url 时应发送的"""
+    parts = urlsplit(url)
+    host, path = parts.hostname, parts.path or '/'
+    now = time.time()
+    pairs = []
+    for c in cookies:
+        domain = c.get('domain', '')
+        # 以 . 开头的是域 cookie，否则只发给该主机
+        if not (host_matches(host, [domain.lstrip('.')]) if domain.startswith('.') else host == domain):
+            continue
+        if not path.startswith(c.get('path', '/')):
+            continue
+        if 0 < c.get('expires', -1) <= now or (c.get('secure') and parts.scheme != 'https'):
+            continue
+        pairs.append(f"{c['name']}={c['value']}")
+    return '; '.join(pairs)
+
+
+def merge_set_cookies(cookies: list, response, url: str):
+    """把响应中的 Set-Cookie 合并进 storage state 格式的 cookie 列表 (原地修改)"""
+    host = urlsplit(url).hostname
+    now = time.time()
+    for name, morsel in response.cookies.items():
+        domain = '.' + morsel['domain'].lstrip('.') if morsel['domain'] else host
+        path = morsel['path'] or '/'
+        expires = -1
+        try:
+            if morsel['max-age']:
+                expires = now + int(morsel['max-age'])
+            elif morsel['expires']:
+                expires = parsedate_to_datetime(morsel['expires']).timestamp()
+        except (TypeError, ValueError):
+            pass
+        cookies[:] = [c for c in cookies if not (c['name'] == name and c.get('path', '/') == path
+                                                 and c['domain'].lstrip('.') == domain.lstrip('.'))]
+        if expires != -1 and expires <= now:
+            continue  # 服务端删除该 cookie
+        cookies.append({'name': name, 'value': morsel.value, 'domain': domain, 'path': path, 'expires': expires,
+                        'httpOnly': bool(morsel['httponly']), 'secure': bool(morsel['secure']),
+                        'sameSite': (morsel['samesite'] or 'Lax').capitalize()})
+
+
+def parse_vps_html(html: str) -> dict:
+    """按页面可见文字提取状态与到期时间 (与浏览器路径的 innerText 一致，不含脚本、样式与注释)"""
+    text = re.sub(r'<(script|style)\b[^>]*>.*?</\1\s*>|<!--.*?-->', ' ', html, flags=re.S | re.I)
+    text = re.sub(r'<[^>]+>', ' ', text)
+    status = VPS_STATUS_RE.search(text)
+    expires = VPS_EXPIRES_RE.search(text)
+    return {'status': status.group(1) if status else None, 'expires': expires.group(1) if expires else None}
+
+
+_http_session = None
+
+
+def get_http_session() -> 'aiohttp.ClientSession':
+    """HTTP 快速路径共用的连接池；cookie 由各账号自己拼接，不使用 cookie jar"""
+    import aiohttp
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(total=20),
+        )
+    return _http_session
+
+
+async def close_http_session():
+    if _http_session and not _http_session.closed:
+        await _http_session.close()
+
+
+def notify_send(title: str, content: str):
+    """青龙通知 (notify.py 依赖较多，发送时才导入)，不在青龙环境时只输出到日志"""
+    try:
+        from notify import send
+    except ImportError:
+        Logger.log("通知", f"{title}: {content}")
+        return
+    send(title, content)
+
+
+def process_tree_rss(root_pid: int) -> int:
+    """进程及其全部子孙进程的常驻内存之和 (字节)，读取 /proc，非 Linux 返回 0"""
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(pid, []))
+    return total
+
+
+# ==================== 日志 ====================
+LOG_SYMBOLS = {"INFO": "ℹ", "OK": "✓", "WARN": "⚠", "ERROR": "✗", "WAIT": "⏳"}
+LOG_LEVELS = {"WARN": logging.WARNING, "ERROR": logging.ERROR}
+
+
+class HumanFormatter(logging.Formatter):
+    def format(self, record):
+        if record.status == 'BLOCK':
+            return record.getMessage()
+        timestamp = datetime.fromtimestamp(record.created).strftime("%H:%M:%S")
+        tag = '|'.join(t for t in (record.account, record.phase) if t)
+        tag = f" [{tag}]" if tag else ""
+        return f"[{timestamp}]{tag} [{record.step}] {LOG_SYMBOLS.get(record.status, '•')} {record.getMessage()}"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'status': record.status,
+            'step': record.step,
+            'msg': record.getMessage(),
+            'account': record.account,
+            'attempt': record.attempt,
+            'phase': record.phase,
+            **record.fields,
+        }
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+_log_listener = None
+
+
+def get_logger() -> logging.Logger:
+    """
+    首次使用时配置: 调用方只把记录放入队列，由后台线程格式化并写出，
+    并发账号的输出按行完整、不会因终端阻塞拖慢事件循环
+    """
+    global _log_listener
+    logger = logging.getLogger('zap')
+    if _log_listener is None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else HumanFormatter())
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _log_listener = logging.handlers.QueueListener(log_queue, handler)
+        _log_listener.start()
+        # 退出前写完队列中剩余的日志
+        atexit.register(_log_listener.stop)
+    return logger
 
 
 class Logger:
     @staticmethod
-    def log(step: str, msg: str, status: str = "INFO"):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        symbols = {"INFO": "ℹ", "OK": "✓", "WARN": "⚠", "ERROR": "✗", "WAIT": "⏳"}
-        symbol = symbols.get(status, "•")
-        print(f"[{timestamp}] [{step}] {symbol} {msg}")
+    def log(step: str, msg: str, status: str = "INFO", **fields):
+        """fields 为结构化字段，只出现在 json 格式中"""
+        # 账号与阶段取自当前协程的上下文 (整次运行的 trace 名为 run)
+        trace = _current_trace.get()
+        account = trace.name if trace and trace.name != 'run' else None
+        get_logger().log(LOG_LEVELS.get(status, logging.INFO), msg, extra={
+            'step': step, 'status': status, 'account': account, 'attempt': trace.attempt if account else None,
+            'phase': _current_span.get() or None, 'fields': fields,
+        })
+    
+    @staticmethod
+    def block(title: str, lines: list, **fields):
+        """多行汇总: human 格式打印带分隔线的块 (None 为分隔线)，json 格式只输出一条带字段的记录"""
+        if LOG_FORMAT == 'json':
+            Logger.log(title, title, **fields)
+            return
+        text = ["", "=" * 60, f"  {title}", "=" * 60]
+        text += ["-" * 60 if line is None else f"  {line}" for line in lines]
+        text += ["=" * 60]
+        Logger.log(title, "\n".join(text), "BLOCK")
+
+
+# ==================== 运行指标 ====================
+_current_trace = contextvars.ContextVar('zap_trace', default=None)
+_current_span = contextvars.ContextVar('zap_span', default='')
+
+
+class Trace:
+    """一个账号 (或整次运行) 各阶段的耗时与计数"""
+    
+    def __init__(self, name: str, attempt: int = 0):
+        self.name = name
+        self.attempt = attempt
+        self.origin = time.monotonic()
+        self.duration = None
+        self.success = None
+        self.spans = []
+        self.counters = {}
+    
+    def finish(self, success: bool):
+        self.duration = round(time.monotonic() - self.origin, 3)
+        self.success = success
+    
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'attempt': self.attempt,
+            'success': self.success,
+            'duration': self.duration,
+            'spans': self.spans,
+            'counters': self.counters,
+        }
+
+
+@contextmanager
+def span(name: str):
+    """记录当前账号一个阶段的耗时，嵌套阶段记为 父/子"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _current_span.get()
+    path = f"{parent}/{name}" if parent else name
+    token = _current_span.set(path)
+    start = time.monotonic()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        _current_span.reset(token)
+        trace.spans.append({
+            'name': path,
+            'start': round(start - trace.origin, 3),
+            'seconds': round(time.monotonic() - start, 3),
+            'ok': ok,
+        })
+
+
+def count(name: str, n: int = 1):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + n
+
+
+def peak(name: str, value: float):
+    """记录最大值，名称以 peak_ 开头，汇总时取最大而不是累加"""
+    trace = _current_trace.get()
+    if trace is not None and value > trace.counters.get(name, 0):
+        trace.counters[name] = value
+
+
+class RunReport:
+    """整次运行的报告，结束时写入 JSON，可选写 Prometheus textfile"""
+    
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.run = Trace('run')
+        self.accounts = []
+    
+    def account(self, email: str, attempt: int = 0) -> Trace:
+        trace = Trace(email, attempt)
+        self.accounts.append(trace)
+        return trace
+    
+    def to_dict(self) -> dict:
+        phases, counters = {}, {}
+        for trace in [self.run, *self.accounts]:
+            for s in trace.spans:
+                phases[s['name']] = round(phases.get(s['name'], 0) + s['seconds'], 3)
+            for k, v in trace.counters.items():
+                # 峰值类指标取最大值，其余累加
+                counters[k] = max(counters.get(k, 0), v) if k.startswith('peak_') else counters.get(k, 0) + v
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'duration': self.run.duration,
+            # 重试时同一账号有多条记录，按账号计数
+            'accounts_total': len({t.name for t in self.accounts}),
+            'accounts_success': len({t.name for t in self.accounts if t.success}),
+            'phase_seconds': phases,
+            'counters': counters,
+            'run': self.run.to_dict(),
+            'accounts': [t.to_dict() for t in self.accounts],
+        }
+    
+    def to_prometheus(self) -> str:
+        def label(value: str) -> str:
+            return value.replace('\\', '\\\\').replace('"', '\\"')
+        
+        data = self.to_dict()
+        lines = [
+            '# TYPE zap_run_duration_seconds gauge',
+            f'zap_run_duration_seconds {data["duration"] or 0}',
+            '# TYPE zap_run_last_timestamp_seconds gauge',
+            f'zap_run_last_timestamp_seconds {int(self.started_at.timestamp())}',
+            '# TYPE zap_run_accounts gauge',
+            f'zap_run_accounts{{result="success"}} {data["accounts_success"]}',
+            f'zap_run_accounts{{result="failure"}} {data["accounts_total"] - data["accounts_success"]}',
+            '# TYPE zap_phase_seconds gauge',
+        ]
+        # 同一账号多次尝试的阶段耗时与计数合并到同一组标签下
+        phases, events = {}, {}
+        for trace in [self.run, *self.accounts]:
+            for s in trace.spans:
+                key = (trace.name, s['name'])
+                phases[key] = phases.get(key, 0) + s['seconds']
+            for k, v in trace.counters.items():
+                key = (trace.name, k)
+                events[key] = max(events.get(key, 0), v) if k.startswith('peak_') else events.get(key, 0) + v
+        for (name, phase), seconds in phases.items():
+            lines.append(f'zap_phase_seconds{{account="{label(name)}",phase="{label(phase)}"}} {seconds:.3f}')
+        lines.append('# TYPE zap_events gauge')
+        for (name, k), v in events.items():
+            lines.append(f'zap_events{{account="{label(name)}",event="{label(k)}"}} {v}')
+        return "\n".join(lines) + "\n"
+    
+    def write(self):
+        try:
+            if REPORT_DIR:
+                path = Path(REPORT_DIR) / f"run-{self.started_at.strftime('%Y%m%d-%H%M%S')}.json"
+                write_json_atomic(path, self.to_dict())
+                Logger.log("报告", f"运行报告已写入 {path}", "OK")
+            if PROM_FILE:
+                write_text_atomic(Path(PROM_FILE), self.to_prometheus())
+        except OSError as e:
+            Logger.log("报告", f"写入运行报告失败: {e}", "WARN")
+
+
+_run_report = None
+
+
+def get_run_report() -> RunReport:
+    global _run_report
+    if _run_report is None:
+        _run_report = RunReport()
+    return _run_report
+
+
+# 名称 -> (显示名, API 密钥, API 地址, reCAPTCHA v2 任务类型, 附加任务字段)
+CAPTCHA_PROVIDERS = {
+    'yescaptcha': ('YesCaptcha', YESCAPTCHA_API_KEY, YESCAPTCHA_API_URL, 'NoCaptchaTaskProxyless', {'softID': '26129'}),
+    'capsolver': ('CapSolver', CAPSOLVER_API_KEY, os.environ.get('CAPSOLVER_API_URL', 'https://api.capsolver.com'),
+                  'ReCaptchaV2TaskProxyLess', {}),
+    '2captcha': ('2Captcha', TWOCAPTCHA_API_KEY, os.environ.get('TWOCAPTCHA_API_URL', 'https://api.2captcha.com'),
+                 'RecaptchaV2TaskProxyless', {}),
+    'anticaptcha': ('Anti-Captcha', ANTICAPTCHA_API_KEY,
+                    os.environ.get('ANTICAPTCHA_API_URL', 'https://api.anti-captcha.com'), 'RecaptchaV2TaskProxyless', {}),
+}
 
 
-class YesCaptchaSolver:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.base_url = YESCAPTCHA_API_URL
+class CaptchaStats:
+    """每个打码平台最近的耗时与成败 (跨运行保存)，用于选择首选平台和对冲时机"""
     
-    def create_task(self, site_key: str, page_url: str) -> str:
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = None
+    
+    def _load(self):
+        if self.data is None:
+            try:
+                with open(self.path) as f:
+                    self.data = json.load(f)
+            except Exception:
+                self.data = {}
+    
+    def record(self, name: str, ok: bool, seconds: float = None):
+        self._load()
+        entry = self.data.setdefault(name, {'latencies': [], 'results': []})
+        entry['results'] = (entry['results'] + [ok])[-CAPTCHA_STATS_WINDOW:]
+        if ok:
+            entry['latencies'] = (entry['latencies'] + [round(seconds, 2)])[-CAPTCHA_STATS_WINDOW:]
+        self._save()
+    
+    def record_lower_bound(self, name: str, seconds: float):
+        """对冲中被取消的请求: 实际耗时至少为 seconds，只计入耗时不计成败，避免百分位只剩快的样本而逐渐偏低"""
+        self._load()
+        entry = self.data.setdefault(name, {'latencies': [], 'results': []})
+        entry['latencies'] = (entry['latencies'] + [round(seconds, 2)])[-CAPTCHA_STATS_WINDOW:]
+        self._save()
+    
+    def _save(self):
+        try:
+            write_json_atomic(self.path, self.data)
+        except OSError:
+            pass
+    
+    def percentile(self, name: str, pct: float):
+        """成功耗时的百分位 (秒)，样本不足时返回 None"""
+        self._load()
+        latencies = sorted(self.data.get(name, {}).get('latencies', []))
+        if len(latencies) < CAPTCHA_STATS_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+    
+    def score(self, name: str) -> float:
+        """期望耗时: 耗时中位数 / 成功率，越小越好；样本不足返回 inf"""
+        self._load()
+        results = self.data.get(name, {}).get('results', [])
+        if len(results) < CAPTCHA_STATS_MIN_SAMPLES:
+            return float('inf')
+        median = self.percentile(name, 50) or CAPTCHA_MAX_WAIT
+        return median / max(sum(results) / len(results), 0.05)
+
+
+captcha_stats = CaptchaStats(CAPTCHA_STATS_FILE)
+
+
+class CaptchaProvider:
+    """兼容 createTask/getTaskResult 接口的打码平台异步客户端，所有账号共用一个连接池"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.label, self.api_key, self.base_url, self.task_type, self.task_extra = CAPTCHA_PROVIDERS[name]
+        self.base_url = self.base_url.rstrip('/')
+        self._session = None
+    
+    async def _get_session(self):
+        # 在事件循环内惰性创建，保持 keep-alive 连接避免每次轮询都重新 TLS 握手
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=CAPTCHA_POOL_SIZE, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+        return self._session
+    
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _post(self, path: str, payload: dict) -> dict:
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}/{path}", json=payload) as response:
+            return await response.json(content_type=None)
+    
+    async def create_task(self, site_key: str, page_url: str) -> str:
         payload = {
             "clientKey": self.api_key,
             "task": {
-                "type": "NoCaptchaTaskProxyless",
+                "type": self.task_type,
                 "websiteURL": page_url,
                 "websiteKey": site_key,
-                "softID": "26129",
+                **self.task_extra,
             }
         }
-        response = requests.post(f"{self.base_url}/createTask", json=payload, timeout=30)
-        result = response.json()
+        count('captcha_tasks')
+        result = await self._post("createTask", payload)
         if result.get("errorId") == 0:
             return result.get("taskId")
-        raise Exception(f"YesCaptcha 创建任务失败: {result.get('errorDescription')}")
+        raise Exception(f"{self.label} 创建任务失败: {result.get('errorDescription')}")
     
-    def get_result(self, task_id: str, max_wait: int = 120) -> str:
+    async def get_result(self, task_id: str, max_wait: int = CAPTCHA_MAX_WAIT) -> str:
         payload = {"clientKey": self.api_key, "taskId": task_id}
-        start_time = time.time()
-        while time.time() - start_time < max_wait:
-            response = requests.post(f"{self.base_url}/getTaskResult", json=payload, timeout=30)
-            result = response.json()
+        deadline = time.monotonic() + max_wait
+        # reCAPTCHA 很少在几秒内解决，先等一段时间，之后轮询间隔逐步拉长
+        delay = CAPTCHA_POLL_INITIAL
+        interval = CAPTCHA_POLL_INTERVAL
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(delay, remaining))
+            count('captcha_polls')
+            result = await self._post("getTaskResult", payload)
             if result.get("errorId") != 0:
-                raise Exception(f"YesCaptcha 错误: {result.get('errorDescription')}")
+                raise Exception(f"{self.label} 错误: {result.get('errorDescription')}")
             if result.get("status") == "ready":
                 return result.get("solution", {}).get("gRecaptchaResponse")
-            time.sleep(3)
-        raise Exception("YesCaptcha 超时")
-    
-    def solve(self, site_key: str, page_url: str) -> str:
-        Logger.log("验证码", "创建 YesCaptcha 任务...", "WAIT")
-        task_id = self.create_task(site_key, page_url)
-        Logger.log("验证码", f"任务 ID: {task_id}")
-        Logger.log("验证码", "等待验证码解决...", "WAIT")
-        token = self.get_result(task_id)
-        Logger.log("验证码", "验证码已解决!", "OK")
+            delay = interval
+            interval = min(interval * CAPTCHA_POLL_BACKOFF, CAPTCHA_POLL_MAX)
+        raise Exception(f"{self.label} 超时")
+    
+    async def solve_once(self, site_key: str, page_url: str) -> str:
+        """提交并等待一个任务，结果计入平台统计 (被取消的不计)"""
+        start = time.monotonic()
+        try:
+            Logger.log("验证码", f"创建 {self.label} 任务...", "WAIT")
+            task_id = await self.create_task(site_key, page_url)
+            Logger.log("验证码", f"{self.label} 任务 ID: {task_id}")
+            token = await self.get_result(task_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            captcha_stats.record(self.name, False)
+            raise
+        captcha_stats.record(self.name, True, time.monotonic() - start)
         return token
+    
+    async def solve(self, site_key: str, page_url: str) -> str:
+        with span('captcha_solve'):
+            Logger.log("验证码", "等待验证码解决...", "WAIT")
+            token = await self.solve_once(site_key, page_url)
+            Logger.log("验证码", "验证码已解决!", "OK")
+            return token
+
+
+class HedgedSolver:
+    """
+    多个打码平台: 按历史表现 (或 CAPTCHA_PROVIDERS 指定的顺序) 选首选平台，
+    首选平台失败时立即切换下一个；开启对冲时，首选平台超过其耗时百分位仍未返回，
+    同时向下一个平台提交，先返回的 token 生效，另一个取消
+    """
+    
+    def __init__(self, providers: list):
+        self.providers = providers
+    
+    def ranked(self) -> list:
+        if CAPTCHA_PROVIDER_ORDER:
+            return self.providers
+        # sorted 稳定，样本不足的平台保持配置顺序排在后面
+        return sorted(self.providers, key=lambda p: captcha_stats.score(p.name))
+    
+    async def close(self):
+        for provider in self.providers:
+            await provider.close()
+    
+    async def _attempt(self, provider: CaptchaProvider, site_key: str, page_url: str) -> str:
+        with span(provider.name):
+            return await provider.solve_once(site_key, page_url)
+    
+    async def solve(self, site_key: str, page_url: str) -> str:
+        with span('captcha_solve'):
+            Logger.log("验证码", "等待验证码解决...", "WAIT")
+            waiting = list(self.ranked())
+            running = {}  # task -> provider
+            started = {}  # task -> 提交时间
+            hedged = False
+            solved = False
+            
+            def start_next():
+                provider = waiting.pop(0)
+                task = asyncio.create_task(self._attempt(provider, site_key, page_url))
+                running[task] = provider
+                started[task] = time.monotonic()
+                return provider
+            
+            def hedge_deadline(provider) -> float:
+                return time.monotonic() + (captcha_stats.percentile(provider.name, CAPTCHA_HEDGE_PERCENTILE)
+                                           or CAPTCHA_HEDGE_AFTER)
+            
+            first = start_next()
+            deadline = hedge_deadline(first)
+            errors = []
+            try:
+                while running:
+                    timeout = None
+                    if CAPTCHA_HEDGE and not hedged and waiting:
+                        timeout = max(0, deadline - time.monotonic())
+                    done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        hedged = True
+                        provider = start_next()
+                        count('captcha_hedged')
+                        Logger.log("验证码", f"{first.label} 未在预期时间内返回，同时提交到 {provider.label}", "WAIT")
+                        continue
+                    for task in done:
+                        provider = running.pop(task)
+                        if task.exception() is None:
+                            count(f'captcha_win_{provider.name}')
+                            Logger.log("验证码", f"验证码已解决! ({provider.label})", "OK")
+                            solved = True
+                            return task.result()
+                        errors.append(f"{provider.label}: {task.exception()}")
+                        Logger.log("验证码", f"{provider.label} 失败: {task.exception()}", "WARN")
+                        if waiting and not running:
+                            first = start_next()
+                            deadline = hedge_deadline(first)
+                raise Exception(f"所有打码平台均失败: {'; '.join(errors)}")
+            finally:
+                for task in running:
+                    if solved and not task.done():
+                        # 输给对方被取消的平台: 已等待的时间是其耗时的下界
+                        captcha_stats.record_lower_bound(running[task].name, time.monotonic() - started[task])
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+
+
+_captcha_solver = None
+
+
+def get_captcha_solver():
+    """
+    返回进程内共享的验证码客户端: 只配置了一个平台时直接返回该平台，
+    多个时返回 HedgedSolver，未配置任何密钥时返回 None
+    """
+    global _captcha_solver
+    if _captcha_solver is None:
+        names = CAPTCHA_PROVIDER_ORDER or list(CAPTCHA_PROVIDERS)
+        providers = [CaptchaProvider(n) for n in names if n in CAPTCHA_PROVIDERS and CAPTCHA_PROVIDERS[n][1]]
+        if len(providers) == 1:
+            _captcha_solver = providers[0]
+        elif providers:
+            _captcha_solver = HedgedSolver(providers)
+    return _captcha_solver
+
+
+async def close_captcha_solver():
+    if _captcha_solver:
+        await _captcha_solver.close()
+
+
+class CaptchaTokenPool:
+    """预先解决的 reCAPTCHA token 池，让打码耗时与浏览器启动、Cloudflare 处理重叠"""
+    
+    def __init__(self, solver, site_key: str, page_url: str, expected: int, max_inflight: int):
+        self.solver = solver
+        self.site_key = site_key
+        self.page_url = page_url
+        self.expected = expected  # 预计仍需登录的次数
+        self.max_inflight = max(1, max_inflight)
+        self.stats = {'solved': 0, 'used': 0, 'expired': 0, 'failed': 0, 'unused': 0}
+        self._ready = []  # [(token, 解决时间)]
+        self._pending = set()
+        self._changed = asyncio.Event()
+        self.trace = _current_trace.get()
+    
+    def start(self):
+        if self.expected > 0:
+            Logger.log("验证码", f"预计 {self.expected} 次登录，开始预取 token...", "WAIT")
+        self._refill()
+    
+    def _drop_expired(self):
+        now = time.monotonic()
+        fresh = [(token, solved_at) for token, solved_at in self._ready if now - solved_at < CAPTCHA_TOKEN_TTL]
+        self.stats['expired'] += len(self._ready) - len(fresh)
+        self._ready = fresh
+    
+    def _in_flight(self) -> int:
+        return sum(1 for task in self._pending if not task.done())
+    
+    def _refill(self):
+        self._drop_expired()
+        missing = min(self.expected, self.max_inflight) - len(self._ready) - self._in_flight()
+        for _ in range(max(missing, 0)):
+            task = asyncio.create_task(self._prefetch_one())
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+    
+    async def _prefetch_one(self):
+        # 预取的耗时计入整次运行，而不是恰好触发补充的账号
+        _current_trace.set(self.trace)
+        _current_span.set('')
+        try:
+            token = await self.solver.solve(self.site_key, self.page_url)
+            self._ready.append((token, time.monotonic()))
+            self.stats['solved'] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats['failed'] += 1
+            Logger.log("验证码", f"预取 token 失败: {e}", "WARN")
+        finally:
+            # 先移出在途集合再唤醒等待者，否则被唤醒的等待者仍把本任务算作在途而继续等待
+            self._pending.discard(asyncio.current_task())
+            self._changed.set()
+    
+    async def acquire(self) -> str:
+        while True:
+            self._drop_expired()
+            if self._ready:
+                token, _ = self._ready.pop(0)
+                self.stats['used'] += 1
+                self.expected = max(self.expected - 1, 0)
+                self._refill()
+                Logger.log("验证码", "使用预取的 token", "OK")
+                return token
+            if not self._in_flight():
+                # 没有在途任务 (预估之外的登录或预取失败)，直接解决
+                self.expected = max(self.expected - 1, 0)
+                token = await self.solver.solve(self.site_key, self.page_url)
+                self.stats['solved'] += 1
+                self.stats['used'] += 1
+                self._refill()
+                return token
+            self._changed.clear()
+            await self._changed.wait()
+    
+    def skip(self):
+        """预估需要登录但会话仍然有效，减少一次需求"""
+        self.expected = max(self.expected - 1, 0)
+    
+    async def close(self):
+        for task in list(self._pending):
+            task.cancel()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        self._drop_expired()
+        self.stats['unused'] = len(self._ready)
+        self._ready = []
+        for k, v in self.stats.items():
+            count(f'token_pool_{k}', v)
+        if self.stats['solved']:
+            Logger.log("验证码", "预取统计: 解决 {solved}, 使用 {used}, 过期 {expired}, "
+                                "未使用 {unused}, 失败 {failed}".format(**self.stats))
+
+
+_egress_ip = None
+_egress_ip_lock = asyncio.Lock()
+
+
+async def get_egress_ip() -> str:
+    """查询出口 IP (cf_clearance 与 IP 绑定)，失败返回空字符串"""
+    global _egress_ip
+    async with _egress_ip_lock:
+        if _egress_ip is None:
+            import aiohttp
+            try:
+                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+                    async with session.get(EGRESS_IP_URL) as response:
+                        _egress_ip = (await response.text()).strip()
+            except Exception as e:
+                Logger.log("CF", f"获取出口 IP 失败，不复用 cf_clearance: {e}", "WARN")
+                _egress_ip = ''
+        return _egress_ip
+
+
+class ClearanceStore:
+    """按 UA + 出口 IP 保存 cf_clearance，后续导航和其他账号直接复用"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = asyncio.Lock()
+    
+    @staticmethod
+    def key(user_agent: str, ip: str) -> str:
+        return hashlib.sha1(f"{user_agent}|{ip}".encode()).hexdigest()
+    
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    
+    def load(self, key: str) -> list:
+        now = time.time()
+        return [c for c in self._read().get(key, []) if c.get('expires', -1) > now]
+    
+    async def save(self, key: str, cookies: list):
+        async with self._lock:
+            now = time.time()
+            # 顺便清理已全部过期的条目
+            data = {k: v for k, v in self._read().items() if any(c.get('expires', -1) > now for c in v)}
+            data[key] = cookies
+            write_json_atomic(self.path, data)
+
+
+clearance_store = ClearanceStore(CF_CLEARANCE_FILE)
+
+
+# ==================== 限速 ====================
+class TokenBucket:
+    """令牌桶: 每分钟补充 rate * factor 个，最多积攒 burst 个；rate 为 0 不限速"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.factor = 1.0
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self) -> float:
+        """取一个令牌，返回等待的秒数。排队按先来后到，降速后立即按新速率计算"""
+        if self.rate <= 0:
+            return 0.0
+        async with self.lock:
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                per_second = self.rate * self.factor / 60
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * per_second)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - started
+                await asyncio.sleep((1 - self.tokens) / per_second)
+
+
+class RateLimiter:
+    """
+    同一出口 IP 上全部账号共用的限速: 导航与登录各一个令牌桶，登录/打码阶段单独限制并发；
+    按最近导航被 Cloudflare 质询的比例自动降速，质询减少后逐步恢复
+    """
+    
+    def __init__(self):
+        self.navigations = TokenBucket(NAV_PER_MIN, NAV_BURST)
+        self.logins = TokenBucket(LOGIN_PER_MIN, LOGIN_BURST)
+        self.login_slots = asyncio.Semaphore(LOGIN_CONCURRENCY)
+        self.outcomes = deque(maxlen=CF_RATE_WINDOW)  # 最近导航是否被质询
+        self.factor = 1.0
+        self.slowed_at = 0.0
+    
+    def set_factor(self, factor: float):
+        self.factor = self.navigations.factor = self.logins.factor = factor
+    
+    async def navigation(self):
+        waited = await self.navigations.acquire()
+        if waited >= 0.1:
+            count('rate_limited_navigations')
+            count('rate_wait_seconds', round(waited, 1))
+    
+    @asynccontextmanager
+    async def login(self):
+        """登录 (含打码) 期间占用一个登录名额"""
+        started = time.monotonic()
+        async with self.login_slots:
+            await self.logins.acquire()
+            waited = time.monotonic() - started
+            if waited >= 0.1:
+                Logger.log("限速", f"等待登录名额 {waited:.1f} 秒")
+                count('rate_wait_seconds', round(waited, 1))
+            yield
+    
+    def observe(self, challenged: bool):
+        """记录一次导航是否遇到 Cloudflare 质询，并据此调整速率"""
+        self.outcomes.append(challenged)
+        rate = sum(self.outcomes) / len(self.outcomes)
+        now = time.monotonic()
+        if challenged and len(self.outcomes) >= CF_RATE_MIN_SAMPLES and rate > CF_TARGET_RATE:
+            if self.factor > RATE_MIN_FACTOR and now - self.slowed_at >= RATE_SLOWDOWN_COOLDOWN:
+                self.set_factor(max(RATE_MIN_FACTOR, self.factor / 2))
+                self.slowed_at = now
+                count('rate_slowdowns')
+                Logger.log("限速", f"最近 {len(self.outcomes)} 次导航质询率 {rate:.0%}，降速至 {self.factor:.0%}", "WARN")
+        elif not challenged and self.factor < 1 and rate <= CF_TARGET_RATE:
+            self.set_factor(min(1.0, self.factor + RATE_RECOVERY_STEP))
+
+
+rate_limiter = RateLimiter()
+
+
+# ==================== 页面元素探测 ====================
+# 一次 evaluate 检查所有角色的全部候选选择器，命中元素打上 data-zap-role 标记，
+# Python 侧再用 [data-zap-role=...] 定位，省去逐个 query_selector + is_visible 的往返
+DOM_PROBE_JS = '''
+    (roles) => {
+        document.querySelectorAll('[data-zap-role]').forEach(e => e.removeAttribute('data-zap-role'));
+        const visible = (el) => {
+            const rect = el.getBoundingClientRect();
+            if (rect.width === 0 || rect.height === 0) return false;
+            return el.checkVisibility ? el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true}) : true;
+        };
+        const textOf = (el) => (el.innerText || el.value || '').trim();
+        const matches = (el, c) => {
+            if (c.exclude && (el.getAttribute('placeholder') || '').toLowerCase().includes(c.exclude)) return false;
+            if (!c.text) return true;
+            const text = textOf(el);
+            if (!c.exact) return text.toLowerCase().includes(c.text.toLowerCase());
+            // 精确匹配时取最内层元素
+            return text === c.text && !Array.from(el.children).some(ch => textOf(ch) === c.text);
+        };
+        const used = new Set();
+        const found = {};
+        for (const [role, candidates] of Object.entries(roles)) {
+            found[role] = null;
+            for (const c of candidates) {
+                const el = Array.from(document.querySelectorAll(c.css))
+                    .find(e => !used.has(e) && matches(e, c) && visible(e));
+                if (el) {
+                    el.setAttribute('data-zap-role', role);
+                    used.add(el);
+                    found[role] = c.id;
+                    break;
+                }
+            }
+        }
+        return found;
+    }
+'''
+
+
+# 在 VPS 列表页内提取全部详情页地址 (去重)，只把地址列表传回 Python
+VPS_LINKS_JS = r'''
+() => [...new Set(Array.from(document.querySelectorAll('a[href*="vserver"]'))
+    .map(a => a.href.split('#')[0])
+    .filter(href => /\/vserver\/(id|show)\//.test(href)))]
+'''
+
+# 在 VPS 详情页内提取状态与到期时间 (页面上有显示时)，只返回精简记录
+VPS_STATUS_JS = r'''
+() => {
+    const text = document.body ? document.body.innerText : '';
+    const status = text.match(/\b(ONLINE|OFFLINE)\b/);
+    const expires = text.match(/(?:expires?|expiry|expiration|valid until|paid until)\s*(?:on|at)?\s*:?\s*(\d{1,4}[./-]\d{1,2}[./-]\d{1,4})/i);
+    return {status: status ? status[1] : null, expires: expires ? expires[1] : null};
+}
+'''
+
+
+def vps_id(url: str) -> str:
+    match = re.search(r'/vserver/(?:id|show)/([^/?#]+)', url)
+    return match.group(1) if match else None
+
+
+# 注入每个页面的弹窗自动关闭脚本: MutationObserver 发现 "Don't show again" 对话框或
+# .modal 遮罩出现即点击关闭，结果通过 __zapDismissed 回报给 Python。
+# 含密码框或 reCAPTCHA 的对话框 (登录框) 永远不会被关闭
+MODAL_DISMISS_JS = '''
+(() => {
+    if (window.__zapDismisser) return;
+    window.__zapDismisser = true;
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    const isLoginModal = (el) => {
+        const modal = el.closest('.modal') || el;
+        return !!modal.querySelector('input[type="password"], .g-recaptcha, iframe[src*="recaptcha"]');
+    };
+    const report = (what) => {
+        try { window.__zapDismissed && window.__zapDismissed(what); } catch (e) {}
+    };
+    const sweep = () => {
+        for (const btn of document.querySelectorAll('button, a')) {
+            if (/don.?t show again/i.test(btn.innerText || '') && visible(btn) && !isLoginModal(btn)) {
+                btn.click();
+                report("Don't show again");
+            }
+        }
+        for (const modal of document.querySelectorAll('.modal')) {
+            if (!visible(modal)) {
+                delete modal.dataset.zapDismissed;
+                continue;
+            }
+            if (modal.dataset.zapDismissed || isLoginModal(modal)) continue;
+            const close = modal.querySelector('.close, .btn-close, [data-dismiss="modal"], [data-bs-dismiss="modal"]');
+            if (close && visible(close)) {
+                modal.dataset.zapDismissed = '1';
+                close.click();
+                report(modal.id ? `.modal#${modal.id}` : '.modal');
+            }
+        }
+    };
+    let timer = null;
+    const schedule = () => {
+        if (timer === null) timer = setTimeout(() => { timer = null; sweep(); }, 100);
+    };
+    new MutationObserver(schedule).observe(document, {
+        childList: true, subtree: true, attributes: true, attributeFilter: ['class', 'style'],
+    });
+    document.addEventListener('DOMContentLoaded', schedule);
+})();
+'''
+
+
+def candidate(css: str, text: str = None, exact: bool = False, exclude: str = None,
+              fallback: bool = False) -> dict:
+    """fallback 为兜底的宽泛选择器: 始终最后尝试，命中也不记住"""
+    cid = f"{css}|{text}" if text else css
+    return {'id': cid, 'css': css, 'text': text, 'exact': exact, 'exclude': exclude, 'fallback': fallback}
+
+
+PROBE_ROLES = {
+    'cookie_accept': [candidate('button', 'Accept all')],
+    'login_link': [candidate('a, button, span', 'Log in!', exact=True),
+                   candidate('a, button, span', 'Already registered', exact=True),
+                   candidate('a', 'Log in')],
+    'email': [candidate('input[placeholder*="E-Mail"]'), candidate('input[placeholder*="e-mail"]'),
+              candidate('input[placeholder*="Username"]'), candidate('.modal input[type="text"]'),
+              candidate('input[type="text"], input[type="email"]', exclude='search', fallback=True)],
+    'password': [candidate('input[type="password"]')],
+    'submit': [candidate('.modal button', 'Login'), candidate('.modal button', 'Log in'),
+               candidate('button', 'Login'), candidate('button', 'Log in'),
+               candidate('.modal button[type="submit"]')],
+    'vps_link': [candidate('a', 'My VPS'), candidate('a[href*="vserver"]')],
+}
+
+
+class SelectorMemory:
+    """记住每个角色上次命中的候选选择器，下次优先尝试 (跨运行保存)"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.winners = None
+    
+    def _load(self):
+        if self.winners is None:
+            try:
+                with open(self.path) as f:
+                    self.winners = json.load(f)
+            except Exception:
+                self.winners = {}
+    
+    def ordered(self, roles: list) -> dict:
+        self._load()
+        return {role: sorted(PROBE_ROLES[role], key=lambda c: (c['fallback'], c['id'] != self.winners.get(role)))
+                for role in roles}
+    
+    def remember(self, role: str, cid: str):
+        self._load()
+        if any(c['id'] == cid and c['fallback'] for c in PROBE_ROLES[role]):
+            # 宽泛的兜底选择器可能命中页面上其他输入框，不作为下次的首选
+            return
+        if self.winners.get(role) != cid:
+            self.winners[role] = cid
+            try:
+                write_json_atomic(self.path, self.winners)
+            except OSError:
+                pass
+
+
+selector_memory = SelectorMemory(SELECTOR_MEMORY_FILE)
+
+
+# ==================== 运行台账 ====================
+class RunLedger:
+    """每个账号最近一次成功/尝试时间、VPS 状态与连续失败次数，用于只处理到期的账号"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries = None
+    
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except Exception:
+                self.entries = {}
+    
+    def get(self, email: str) -> dict:
+        self._load()
+        return self.entries.get(email, {})
+    
+    def overdue(self, email: str, now: float) -> float:
+        """距应处理时间已过去的秒数，从未成功或上次失败的账号视为无限逾期"""
+        entry = self.get(email)
+        if entry.get('failures') or not entry.get('last_success'):
+            return float('inf')
+        return now - entry['last_success'] - MIN_INTERVAL_HOURS * 3600
+    
+    def due(self, accounts: list) -> list:
+        """到期的账号，最逾期的在前"""
+        now = time.time()
+        overdue = {a['email']: self.overdue(a['email'], now) for a in accounts}
+        return sorted((a for a in accounts if overdue[a['email']] >= 0), key=lambda a: -overdue[a['email']])
+    
+    def record(self, email: str, success: bool, vps_status: str = None, vps: list = None):
+        self._load()
+        now = time.time()
+        entry = self.entries.setdefault(email, {'last_success': None, 'vps_status': None, 'failures': 0})
+        entry['last_attempt'] = now
+        if success:
+            entry['last_success'] = now
+            entry['failures'] = 0
+        else:
+            entry['failures'] = entry.get('failures', 0) + 1
+        if vps_status:
+            entry['vps_status'] = vps_status
+        if vps:
+            entry['vps'] = [{k: r.get(k) for k in ('id', 'status', 'expires')} for r in vps]
+        try:
+            write_json_atomic(self.path, self.entries)
+        except OSError as e:
+            Logger.log("台账", f"写入运行台账失败: {e}", "WARN")
+
+
+run_ledger = RunLedger(LEDGER_FILE)
+
+
+class Checkpoint:
+    """本次运行已完成 (成功或重试用尽) 的账号，正常结束时删除，中断后重跑据此续跑"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed = {}  # email -> 是否成功
+    
+    def resume(self) -> dict:
+        """读取未过期的断点，返回已完成账号的结果"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        if time.time() - data.get('updated_at', 0) > CHECKPOINT_TTL_HOURS * 3600:
+            self.clear()
+            return {}
+        self.completed = data.get('completed', {})
+        return dict(self.completed)
+    
+    def mark(self, email: str, success: bool):
+        self.completed[email] = success
+        try:
+            write_json_atomic(self.path, {'updated_at': time.time(), 'completed': self.completed})
+        except OSError as e:
+            Logger.log("断点", f"写入断点失败: {e}", "WARN")
+    
+    def clear(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
 
 
 class ZapKeepAlive:
-    def __init__(self, email: str, password: str):
+    def __init__(self, email: str, password: str, token_pool: CaptchaTokenPool = None):
         self.email = email
         self.password = password
         self.session_file = get_session_file(email)
-        self.solver = YesCaptchaSolver(YESCAPTCHA_API_KEY) if YESCAPTCHA_API_KEY else None
+        self.solver = get_captcha_solver()
+        self.token_pool = token_pool
+        self.session = load_session_data(self.session_file)
+        self.predicted_login = session_likely_stale(self.session_file)
+        self.logged_in = False
         self.browser = None
         self.context = None
         self.page = None
         self.cdp = None
+        self.clearance_key = None
+        self.cf_cleared = asyncio.Event()
+        self.trace = None
+        self.vps_urls = []  # 已解析的 VPS 详情页地址，随会话保存
+        self.vps_discovered_at = 0  # 上次从 Dashboard 查找 VPS 列表的时间
+        self.vps_records = []  # 每个 VPS 的精简记录 {id, url, status, expires}
+        self.tab_cdps = {}  # VPS 标签页 -> CDP 会话
+        self.known_logged_out = False  # HTTP 快速路径已确认会话失效
+        self.phase = None  # 当前阶段，异常时用于定位
+        self.retryable = True  # 账号密码错误等重试也无法成功的失败置为 False
+        self.net = {'requests': 0, 'bytes': 0, 'blocked': 0, 'saved_bytes_est': 0}
+    
+    async def probe(self, *roles: str) -> dict:
+        """一次往返找出各角色第一个可见的元素，返回 {角色: Locator 或 None}"""
+        try:
+            found = await self.page.evaluate(DOM_PROBE_JS, selector_memory.ordered(roles))
+        except Exception:
+            found = {}
+        count('dom_probes')
+        result = {}
+        for role in roles:
+            if found.get(role):
+                selector_memory.remember(role, found[role])
+                result[role] = self.page.locator(f'[data-zap-role="{role}"]')
+            else:
+                count('selector_misses')
+                result[role] = None
+        return result
+    
+    async def goto(self, page, url: str, **kwargs):
+        """所有页面导航都经过全局限速"""
+        await rate_limiter.navigation()
+        return await page.goto(url, **kwargs)
+    
+    async def settle(self, seconds: float, state: str = 'load', page=None):
+        """保守模式固定等待 seconds 秒，否则等待页面到达 state，最多 seconds 秒"""
+        if CONSERVATIVE_WAITS:
+            await asyncio.sleep(seconds)
+            return
+        try:
+            await (page or self.page).wait_for_load_state(state, timeout=seconds * 1000)
+        except Exception:
+            pass
+    
+    async def pause(self, seconds: float):
+        """仅在保守模式下保留的固定延时"""
+        if CONSERVATIVE_WAITS:
+            await asyncio.sleep(seconds)
+    
+    async def wait_visible(self, selector: str, seconds: float) -> bool:
+        """等待元素可见，最多 WAIT_TIMEOUT 秒；保守模式固定等待 seconds 秒"""
+        if CONSERVATIVE_WAITS:
+            await asyncio.sleep(seconds)
+            return True
+        try:
+            await self.page.wait_for_selector(selector, state='visible', timeout=WAIT_TIMEOUT * 1000)
+            return True
+        except Exception:
+            count('selector_misses')
+            return False
+    
+    async def wait_url(self, keyword: str, seconds: float) -> bool:
+        """等待 URL 包含 keyword，最多 WAIT_TIMEOUT 秒；保守模式固定等待 seconds 秒"""
+        if CONSERVATIVE_WAITS:
+            await asyncio.sleep(seconds)
+        else:
+            try:
+                await self.page.wait_for_url(lambda url: keyword in url, wait_until='domcontentloaded',
+                                             timeout=WAIT_TIMEOUT * 1000)
+            except Exception:
+                pass
+        return keyword in self.page.url
+    
+    async def watch_clearance(self, cdp=None):
+        # 通过 CDP 监听响应头，cf_clearance 一写入即视为质询完成
+        cdp = cdp or self.cdp
+        cdp.on('Network.responseReceivedExtraInfo', self._on_response_extra_info)
+        await cdp.send('Network.enable')
+    
+    def _on_response_extra_info(self, params: dict):
+        for name, value in params.get('headers', {}).items():
+            if name.lower() == 'set-cookie' and 'cf_clearance=' in value:
+                self.cf_cleared.set()
+    
+    async def install_modal_dismisser(self):
+        await self.context.expose_binding('__zapDismissed', self._on_modal_dismissed)
+        await self.context.add_init_script(MODAL_DISMISS_JS)
+    
+    def _on_modal_dismissed(self, source, what: str):
+        # 回调不在账号的任务上下文中，直接写入本账号的 trace
+        self.trace.counters['modals_dismissed'] = self.trace.counters.get('modals_dismissed', 0) + 1
+        Logger.log("弹窗", f"已自动关闭: {what}")
+    
+    async def install_network_filter(self):
+        # 流量统计来自 CDP (只含主页面，不含跨站 iframe)
+        self.cdp.on('Network.loadingFinished', self._on_loading_finished)
+        if NET_FILTER:
+            await self.context.route('**/*', self._route)
+    
+    def _on_loading_finished(self, params: dict):
+        self.net['requests'] += 1
+        self.net['bytes'] += int(params.get('encodedDataLength', 0))
+    
+    async def _route(self, route):
+        request = route.request
+        reason = block_reason(request.url, request.resource_type)
+        try:
+            if reason:
+                self.net['blocked'] += 1
+                self.net['saved_bytes_est'] += BLOCKED_SIZE_ESTIMATE.get(request.resource_type, 10_000)
+                self.trace.counters[f'net_blocked_{reason}'] = self.trace.counters.get(f'net_blocked_{reason}', 0) + 1
+                await route.abort('blockedbyclient')
+            else:
+                await route.continue_()
+        except Exception:
+            # 页面已关闭或请求已被取消
+            pass
+    
+    def report_network(self):
+        for k, v in self.net.items():
+            self.trace.counters[f'net_{k}'] = v
+        Logger.log("网络", f"请求 {self.net['requests']} 个，共 {self.net['bytes'] / 1024:.0f} KB；"
+                          f"拦截 {self.net['blocked']} 个，约节省 {self.net['saved_bytes_est'] / 1024:.0f} KB")
+    
+    async def apply_clearance(self):
+        if not CF_CLEARANCE_REUSE:
+            return
+        ip = await get_egress_ip()
+        if not ip:
+            return
+        self.clearance_key = ClearanceStore.key(USER_AGENT, ip)
+        cookies = clearance_store.load(self.clearance_key)
+        if cookies:
+            await self.context.add_cookies(cookies)
+            Logger.log("CF", "已复用 cf_clearance", "OK")
+    
+    async def store_clearance(self):
+        if not self.clearance_key:
+            return
+        cookies = [c for c in await self.context.cookies() if c['name'] == 'cf_clearance']
+        if cookies:
+            await clearance_store.save(self.clearance_key, cookies)
+    
+    def cdp_for(self, page):
+        """页面对应的 CDP 会话: 主页面用 self.cdp，VPS 标签页各有自己的会话"""
+        return self.cdp if page is self.page else self.tab_cdps[page]
+    
+    async def challenge_state(self, page):
+        """True 为质询页、False 为普通页面、None 为页面仍在跳转或加载超时无法判断"""
+        try:
+            await page.wait_for_load_state('domcontentloaded', timeout=5000)
+            return "Just a moment" in await page.title()
+        except Exception:
+            return None
     
-    async def handle_cloudflare(self, max_attempts: int = 20) -> bool:
-        for attempt in range(max_attempts):
+    async def wait_challenge_done(self, seconds: float, page) -> bool:
+        """等待 cf_clearance 写入或质询页跳转，先到为准"""
+        title_task = asyncio.create_task(page.wait_for_function(
+            '() => !document.title.includes("Just a moment")', timeout=seconds * 1000))
+        cookie_task = asyncio.create_task(self.cf_cleared.wait())
+        try:
+            done, _ = await asyncio.wait({title_task, cookie_task}, timeout=seconds,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (title_task, cookie_task):
+                task.cancel()
+            await asyncio.gather(title_task, cookie_task, return_exceptions=True)
+        if cookie_task in done:
+            # 已拿到 clearance，等质询页跳回目标页面
             try:
-                await self.page.wait_for_load_state('domcontentloaded', timeout=5000)
-                title = await self.page.title()
-                if "Just a moment" not in title:
-                    return True
-            except:
-                await asyncio.sleep(1)
-                continue
-            wrapper = await self.page.query_selector('.main-wrapper')
-            if wrapper:
-                rect = await wrapper.bounding_box()
-                if rect:
-                    x, y = int(rect['x'] + 25), int(rect['y'] + rect['height'] / 2)
-                    await self.cdp.send('Input.dispatchMouseEvent', {
-                        'type': 'mousePressed', 'x': x, 'y': y, 'button': 'left', 'clickCount': 1
-                    })
-                    await asyncio.sleep(0.1)
-                    await self.cdp.send('Input.dispatchMouseEvent', {
-                        'type': 'mouseReleased', 'x': x, 'y': y, 'button': 'left', 'clickCount': 1
-                    })
-            await asyncio.sleep(2)
-        return False
+                await page.wait_for_function('() => !document.title.includes("Just a moment")',
+                                             timeout=WAIT_TIMEOUT * 1000)
+            except Exception:
+                pass
+            return True
+        return title_task in done and not title_task.cancelled() and title_task.exception() is None
     
-    async def close_modals(self):
+    async def click_challenge(self, page):
+        cdp = self.cdp_for(page)
         try:
-            dont_show = await self.page.query_selector('button:has-text("Don\'t show again")')
-            if dont_show and await dont_show.is_visible():
-                await dont_show.click()
-                await asyncio.sleep(1)
-            close_btns = await self.page.query_selector_all('.modal .close, button.close, [data-dismiss="modal"]')
-            for btn in close_btns:
-                try:
-                    if await btn.is_visible():
-                        await btn.click()
-                        await asyncio.sleep(0.5)
-                except:
-                    pass
-            await self.page.keyboard.press('Escape')
-            await asyncio.sleep(0.5)
-        except:
-            pass
+            wrapper = await page.query_selector('.main-wrapper')
+            rect = await wrapper.bounding_box() if wrapper else None
+        except Exception:
+            return
+        if rect:
+            x, y = int(rect['x'] + 25), int(rect['y'] + rect['height'] / 2)
+            await cdp.send('Input.dispatchMouseEvent', {
+                'type': 'mousePressed', 'x': x, 'y': y, 'button': 'left', 'clickCount': 1
+            })
+            await asyncio.sleep(0.1)
+            await cdp.send('Input.dispatchMouseEvent', {
+                'type': 'mouseReleased', 'x': x, 'y': y, 'button': 'left', 'clickCount': 1
+            })
+    
+    async def handle_cloudflare(self, max_attempts: int = 20, page=None) -> bool:
+        with span('cloudflare'):
+            return await self._handle_cloudflare(max_attempts, page or self.page)
+    
+    async def _handle_cloudflare(self, max_attempts: int, page) -> bool:
+        count('cf_checks')
+        deadline = time.monotonic() + max_attempts * CF_ATTEMPT_SECONDS
+        state = await self.challenge_state(page)
+        while state is None and time.monotonic() < deadline:
+            # 页面仍在跳转或加载，无法判断是否为质询: 只等待，不计入质询统计
+            await asyncio.sleep(1)
+            state = await self.challenge_state(page)
+        if state is None:
+            Logger.log("CF", "页面加载超时，无法判断 Cloudflare 状态", "WARN")
+            return False
+        # 只把确实看到 (或确实没有) 质询页的结果计入质询率，页面慢不应触发降速
+        rate_limiter.observe(state)
+        if state is False:
+            return True
+        count('cf_challenges')
+        Logger.log("CF", "检测到 Cloudflare 质询，等待完成...", "WAIT")
+        started = time.monotonic()
+        self.cf_cleared.clear()
+        passed = False
+        while not passed and time.monotonic() < deadline:
+            passed = await self.wait_challenge_done(min(CF_CLICK_INTERVAL, deadline - time.monotonic()), page)
+            if not passed:
+                count('cf_clicks')
+                await self.click_challenge(page)
+        elapsed = round(time.monotonic() - started, 2)
+        # 只统计真正遇到质询的耗时 (cloudflare 阶段还包含未被质询的检查)，合计与单次最长分别记录
+        count('cf_challenge_seconds', elapsed)
+        peak('peak_cf_challenge_seconds', elapsed)
+        if passed:
+            Logger.log("CF", f"质询完成，耗时 {elapsed:.1f} 秒", "OK")
+            await self.store_clearance()
+        else:
+            count('cf_failures')
+        return passed
     
     async def login(self) -> bool:
         Logger.log("登录", f"开始登录 {self.email}...", "WAIT")
         Logger.log("登录", "导航到登录页面...")
-        await self.page.goto(LOGIN_URL)
-        await asyncio.sleep(3)
+        await self.goto(self.page, LOGIN_URL)
+        await self.settle(3, 'domcontentloaded')
         
         Logger.log("登录", "处理 Cloudflare 验证...", "WAIT")
         if not await self.handle_cloudflare():
             Logger.log("登录", "Cloudflare 验证超时", "ERROR")
             return False
         Logger.log("登录", "Cloudflare 验证通过!", "OK")
-        await asyncio.sleep(2)
+        await self.wait_visible('button:has-text("Accept all"), :text-is("Log in!"), '
+                                ':text-is("Already registered"), a:has-text("Log in")', 2)
         
-        try:
-            btn = await self.page.query_selector('button:has-text("Accept all")')
-            if btn:
-                await btn.click()
+        found = await self.probe('cookie_accept', 'login_link')
+        if found['cookie_accept']:
+            try:
+                await found['cookie_accept'].click()
                 Logger.log("登录", "已接受 cookies", "OK")
-        except:
-            pass
-        await asyncio.sleep(1)
+            except:
+                pass
+        await self.pause(1)
         
         Logger.log("登录", "打开登录对话框...")
-        login_link = await self.page.query_selector('text="Log in!"') or \
-                     await self.page.query_selector('text="Already registered"') or \
-                     await self.page.query_selector('a:has-text("Log in")')
-        if login_link:
-            await login_link.click()
+        if found['login_link']:
+            await found['login_link'].click()
             Logger.log("登录", "已点击登录链接", "OK")
         
         # 点击后 reCAPTCHA 开始加载，立即开始解决
         recaptcha_task = None
-        if self.solver:
+        if self.token_pool:
+            Logger.log("登录", "从 token 池获取 reCAPTCHA (异步)...", "WAIT")
+            recaptcha_task = asyncio.create_task(self.token_pool.acquire())
+        elif self.solver:
             Logger.log("登录", "开始解决 reCAPTCHA (异步)...", "WAIT")
-            # 异步创建任务
-            import concurrent.futures
-            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-            recaptcha_task = executor.submit(self.solver.solve, RECAPTCHA_SITEKEY, LOGIN_URL)
+            recaptcha_task = asyncio.create_task(self.solver.solve(RECAPTCHA_SITEKEY, LOGIN_URL))
         
-        await asyncio.sleep(2)  # 等待对话框加载
+        try:
+            return await self.submit_login(recaptcha_task)
+        finally:
+            # 提前失败返回时取消仍在轮询的验证码任务
+            if recaptcha_task and not recaptcha_task.done():
+                recaptcha_task.cancel()
+    
+    async def submit_login(self, recaptcha_task) -> bool:
+        await self.wait_visible('input[type="password"]', 2)  # 等待对话框加载
         
         Logger.log("登录", "填写登录表单...")
         
-        # 查找用户名输入框
-        email_input = None
-        for selector in ['input[placeholder*="E-Mail"]', 'input[placeholder*="e-mail"]', 
-                         'input[placeholder*="Username"]', '.modal input[type="text"]']:
-            email_input = await self.page.query_selector(selector)
-            if email_input and await email_input.is_visible():
-                break
-            email_input = None
-        
-        if not email_input:
-            all_inputs = await self.page.query_selector_all('input[type="text"], input[type="email"]')
-            for inp in all_inputs:
-                if await inp.is_visible():
-                    placeholder = await inp.get_attribute('placeholder') or ''
-                    if 'search' not in placeholder.lower():
-                        email_input = inp
-                        break
+        form = await self.probe('email', 'password', 'submit')
+        email_input, password_input = form['email'], form['password']
         
         if email_input:
-            await email_input.click()
             await email_input.fill(self.email)
             Logger.log("登录", f"用户名: {self.email}", "OK")
         else:
             Logger.log("登录", "找不到用户名输入框", "ERROR")
             return False
         
-        # 查找密码输入框
-        password_input = None
-        all_passwords = await self.page.query_selector_all('input[type="password"]')
-        for pwd in all_passwords:
-            if await pwd.is_visible():
-                password_input = pwd
-                break
-        
         if password_input:
-            await password_input.click()
             await password_input.fill(self.password)
             Logger.log("登录", "密码: ********", "OK")
         else:
@@ -263,7 +1829,8 @@ class ZapKeepAlive:
         if recaptcha_task:
             Logger.log("登录", "等待 reCAPTCHA 结果...", "WAIT")
             try:
-                recaptcha_token = recaptcha_task.result(timeout=120)
+                with span('captcha_wait'):
+                    recaptcha_token = await asyncio.wait_for(recaptcha_task, timeout=CAPTCHA_MAX_WAIT)
                 Logger.log("登录", "reCAPTCHA 已解决", "OK")
                 
                 # 注入 token
@@ -296,17 +1863,10 @@ class ZapKeepAlive:
         
         # 立即点击登录按钮
         Logger.log("登录", "点击 Login 按钮...")
-        login_btn = None
-        for selector in ['.modal button:has-text("Login")', '.modal button:has-text("Log in")', 
-                         'button:has-text("Login")', 'button:has-text("Log in")', 
-                         '.modal button[type="submit"]']:
-            try:
-                btn = await self.page.query_selector(selector)
-                if btn and await btn.is_visible():
-                    login_btn = btn
-                    break
-            except:
-                continue
+        login_btn = form['submit']
+        if login_btn and not await login_btn.count():
+            # 注入 token 后按钮被重新渲染，标记丢失时重新探测
+            login_btn = (await self.probe('submit'))['submit']
         
         if login_btn:
             await login_btn.click()
@@ -316,8 +1876,28 @@ class ZapKeepAlive:
             Logger.log("登录", "未找到按钮，按 Enter", "WARN")
         
         Logger.log("登录", "等待登录结果...", "WAIT")
-        await asyncio.sleep(5)
+        with span('login_result'):
+            if CONSERVATIVE_WAITS:
+                await self.poll_login_result()
+            else:
+                await self.wait_login_result()
+        
+        url = self.page.url
+        if 'customer' in url:
+            Logger.log("登录", "登录成功!", "OK")
+            return True
         
+        # 调试信息
+        await self.log_modal_content()
+        Logger.log("登录", f"登录失败 - 当前URL: {url}", "ERROR")
+        try:
+            page_text = await self.page.evaluate('() => document.body.innerText.substring(0, 500)')
+            Logger.log("登录", f"页面内容: {page_text[:200]}...", "INFO")
+        except:
+            pass
+        return False
+    
+    async def log_modal_content(self):
         # 调试: 检查页面上是否有错误提示
         try:
             modal_content = await self.page.evaluate('() => document.querySelector(".modal-body, .modal-content")?.innerText || ""')
@@ -325,250 +1905,1054 @@ class ZapKeepAlive:
                 Logger.log("登录", f"Modal 内容: {modal_content[:150]}", "INFO")
         except:
             pass
-        
-        # 关闭可能的弹窗
-        await self.close_modals()
+    
+    async def wait_login_result(self):
+        """等待跳转到 /customer/ 或出现密码错误提示，二者先到为准"""
+        timeout = LOGIN_TIMEOUT * 1000
+        url_task = asyncio.create_task(self.page.wait_for_url(
+            lambda url: 'customer' in url, wait_until='commit', timeout=timeout))
+        error_task = asyncio.create_task(self.page.wait_for_function(
+            '() => /wrong/i.test(document.querySelector(".alert-danger, .error-message, .login-error, .text-danger")?.innerText || "")',
+            timeout=timeout))
+        try:
+            done, _ = await asyncio.wait({url_task, error_task}, return_when=asyncio.FIRST_COMPLETED)
+            if error_task in done and error_task.exception() is None:
+                error_text = await self.page.evaluate('() => document.querySelector(".alert-danger, .error-message, .login-error, .text-danger")?.innerText || ""')
+                Logger.log("登录", f"错误提示: {error_text[:100]}", "ERROR")
+                self.retryable = False
+                return
+            if url_task not in done:
+                # 错误检测本身失败 (如页面跳转中)，继续只等 URL
+                await asyncio.wait({url_task})
+        finally:
+            for task in (url_task, error_task):
+                task.cancel()
+            await asyncio.gather(url_task, error_task, return_exceptions=True)
+    
+    async def poll_login_result(self):
+        """保守模式: 固定间隔轮询登录结果"""
+        await asyncio.sleep(5)
+        await self.log_modal_content()
         
         # 等待并检查多次
         for i in range(15):
             await asyncio.sleep(2)
             
-            # 每次都尝试关闭弹窗
-            await self.close_modals()
-            
-            url = self.page.url
-            if 'customer' in url:
-                Logger.log("登录", "登录成功!", "OK")
-                return True
+            if 'customer' in self.page.url:
+                return
             
             # 检查是否有错误提示
             try:
                 error_text = await self.page.evaluate('() => document.querySelector(".alert-danger, .error-message, .login-error, .text-danger")?.innerText || ""')
                 if error_text and 'wrong' in error_text.lower():
                     Logger.log("登录", f"错误提示: {error_text[:100]}", "ERROR")
-                    break
+                    self.retryable = False
+                    return
             except:
                 pass
-        
-        url = self.page.url
-        if 'customer' in url:
-            Logger.log("登录", "登录成功!", "OK")
-            return True
-        
-        # 调试信息
-        Logger.log("登录", f"登录失败 - 当前URL: {url}", "ERROR")
-        try:
-            page_text = await self.page.evaluate('() => document.body.innerText.substring(0, 500)')
-            Logger.log("登录", f"页面内容: {page_text[:200]}...", "INFO")
-        except:
-            pass
-        return False
+    
+    @property
+    def vps_status(self):
+        """所有 VPS 的汇总状态: 任一 OFFLINE 为 OFFLINE，全部 ONLINE 为 ONLINE，否则未知"""
+        statuses = {r.get('status') for r in self.vps_records}
+        if 'OFFLINE' in statuses:
+            return 'OFFLINE'
+        return 'ONLINE' if statuses == {'ONLINE'} else None
     
     async def visit_vps_detail(self) -> bool:
+        """在主页面进入第一个 VPS 详情页 (同时验证会话)，其余 VPS 在保活阶段用标签页访问"""
+        self.vps_records = []
+        if self.vps_urls and (self.logged_in or vps_list_stale(self.vps_discovered_at)):
+            # 刚重新登录或列表过期: 从 Dashboard 重新查找，发现新增或删除的 VPS
+            Logger.log("VPS", "重新查找 VPS 列表" + ("" if self.logged_in else " (缓存已过期)"))
+            self.vps_urls = []
+        if self.vps_urls:
+            if await self.visit_cached_vps(self.vps_urls[0]):
+                return True
+            if self.on_login_page():
+                # 会话失效而不是地址失效，保留缓存交给调用方重新登录
+                return False
+            count('vps_cache_misses')
+            Logger.log("VPS", "缓存的详情页地址失效，重新查找", "WARN")
+            self.vps_urls = []
+        return await self.discover_vps_detail()
+    
+    async def open_vps_page(self, page, url: str) -> bool:
+        await self.goto(page, url, wait_until='domcontentloaded')
+        await self.settle(3, page=page)
+        if not await self.handle_cloudflare(10, page):
+            return False
+        await self.settle(2, page=page)
+        current_url = page.url
+        # 跳转到登录页或不再是 vserver 页面时视为失效
+        return 'vserver' in current_url and 'customer' in current_url and 'login' not in current_url.lower()
+    
+    async def visit_cached_vps(self, url: str) -> bool:
+        Logger.log("VPS", "直接访问缓存的 VPS 详情页...", "WAIT")
+        if not await self.open_vps_page(self.page, url):
+            return False
+        Logger.log("VPS", f"当前页面: {self.page.url}")
+        self.vps_records.append(await self.read_vps_status(self.page))
+        return True
+    
+    async def discover_vps_detail(self) -> bool:
         Logger.log("VPS", "访问 Dashboard...", "WAIT")
-        await self.page.goto(DASHBOARD_URL, wait_until='domcontentloaded')
-        await asyncio.sleep(3)
+        await self.goto(self.page, DASHBOARD_URL, wait_until='domcontentloaded')
+        await self.settle(3)
         
         if not await self.handle_cloudflare():
             Logger.log("VPS", "Cloudflare 验证超时", "ERROR")
             return False
         Logger.log("VPS", "Cloudflare 验证通过!", "OK")
-        await asyncio.sleep(2)
-        
-        await self.close_modals()
+        await self.settle(2)
+        if self.on_login_page():
+            Logger.log("VPS", "未登录，无法进入 Dashboard", "ERROR")
+            return False
         
         Logger.log("VPS", "查找 My VPS 入口...")
-        vps_link = None
-        for selector in ['a:has-text("My VPS")', 'a[href*="vserver"]', 'text=My VPS']:
-            try:
-                link = await self.page.query_selector(selector)
-                if link and await link.is_visible():
-                    vps_link = link
-                    break
-            except:
-                continue
-        
+        await self.wait_visible('a:has-text("My VPS"), a[href*="vserver"]', 0)
+        vps_link = (await self.probe('vps_link'))['vps_link']
         if vps_link:
             await vps_link.click()
             Logger.log("VPS", "点击了 My VPS", "OK")
-            await asyncio.sleep(3)
+            await self.wait_url('vserver', 3)
         
         await self.handle_cloudflare(10)
-        await asyncio.sleep(2)
+        await self.settle(2)
         
         Logger.log("VPS", "查找 VPS 详情页...")
-        links = await self.page.evaluate('''
-            () => {
-                const links = document.querySelectorAll('a');
-                return Array.from(links).map(a => ({
-                    text: a.innerText.trim().substring(0, 100),
-                    href: a.href
-                })).filter(l => l.href && l.href.includes('vserver'));
-            }
-        ''')
-        
-        for link in links:
-            if '/id/' in link['href'] or '/show/' in link['href']:
-                await self.page.goto(link['href'])
-                Logger.log("VPS", f"进入 VPS 详情页", "OK")
-                break
-        
-        await asyncio.sleep(3)
-        await self.handle_cloudflare(10)
-        await asyncio.sleep(2)
-        await self.close_modals()
+        await self.wait_visible('a[href*="vserver"][href*="/id/"], a[href*="vserver"][href*="/show/"]', 0)
+        urls = await self.page.evaluate(VPS_LINKS_JS)
+        if urls:
+            Logger.log("VPS", f"找到 {len(urls)} 个 VPS", "OK")
+            await self.goto(self.page, urls[0])
+            Logger.log("VPS", f"进入 VPS 详情页", "OK")
+            await self.settle(3)
+            await self.handle_cloudflare(10)
+            await self.settle(2)
         
         current_url = self.page.url
         Logger.log("VPS", f"当前页面: {current_url}")
-        
+        if 'vserver' not in current_url:
+            return False
+        self.vps_records.append(await self.read_vps_status(self.page))
+        if vps_id(current_url):
+            # 主页面停在第一个 VPS 上 (使用跳转后的实际地址)，其余的在保活阶段打开
+            self.vps_urls = [current_url] + [u for u in urls if vps_id(u) != vps_id(current_url)]
+            self.vps_discovered_at = time.time()
+        return True
+    
+    async def read_vps_status(self, page) -> dict:
+        """从详情页提取精简记录 {id, url, status, expires}"""
         try:
-            page_text = await self.page.evaluate('() => document.body.innerText')
-            if 'ONLINE' in page_text:
-                Logger.log("VPS", "VPS 状态: ONLINE", "OK")
-            elif 'OFFLINE' in page_text:
-                Logger.log("VPS", "VPS 状态: OFFLINE", "WARN")
-        except:
+            if not CONSERVATIVE_WAITS:
+                await page.wait_for_function(
+                    '() => /ONLINE|OFFLINE/.test(document.body.innerText)', timeout=WAIT_TIMEOUT * 1000)
+        except Exception:
             pass
-        
-        return 'vserver' in current_url
+        record = {'id': vps_id(page.url), 'url': page.url, 'status': None, 'expires': None}
+        try:
+            record.update(await page.evaluate(VPS_STATUS_JS))
+        except Exception:
+            pass
+        label = f"VPS #{record['id']}" if record['id'] else "VPS"
+        expires = f"，到期 {record['expires']}" if record['expires'] else ""
+        if record['status'] == 'ONLINE':
+            Logger.log("VPS", f"{label} 状态: ONLINE{expires}", "OK")
+        elif record['status'] == 'OFFLINE':
+            Logger.log("VPS", f"{label} 状态: OFFLINE{expires}", "WARN")
+        return record
     
-    async def stay_and_refresh(self):
-        Logger.log("保活", f"在 VPS 详情页停留 {STAY_DURATION} 秒...", "WAIT")
-        for i in range(STAY_DURATION, 0, -1):
-            print(f"\r[{datetime.now().strftime('%H:%M:%S')}] [保活] ⏳ 剩余 {i} 秒...", end='', flush=True)
-            await asyncio.sleep(1)
-        print()
-        Logger.log("保活", "停留完成", "OK")
+    async def keep_vps_tab(self, url: str) -> dict:
+        """在新标签页中访问一个 VPS 详情页并完成停留/刷新，结束后立即关闭"""
+        page = await self.context.new_page()
+        cdp = self.tab_cdps[page] = await self.context.new_cdp_session(page)
+        try:
+            await self.watch_clearance(cdp)
+            cdp.on('Network.loadingFinished', self._on_loading_finished)
+            if not await self.open_vps_page(page, url):
+                Logger.log("VPS", f"VPS #{vps_id(url)} 详情页无法访问", "ERROR")
+                return {'id': vps_id(url), 'url': url, 'status': None, 'expires': None, 'error': 'unreachable'}
+            record = await self.read_vps_status(page)
+            record['id'] = record['id'] or vps_id(url)
+            await self.stay_and_refresh(page)
+            return record
+        finally:
+            del self.tab_cdps[page]
+            try:
+                await cdp.detach()
+            except Exception:
+                pass
+            await page.close()
+    
+    async def stay_all(self):
+        """主页面与其余 VPS 标签页同时停留并刷新，同时打开的页面数不超过 ZAP_VPS_TABS"""
+        others = self.vps_urls[1:]
+        if not others:
+            await self.stay_and_refresh()
+            return
+        Logger.log("保活", f"另外 {len(others)} 个 VPS 在新标签页中并行保活", "WAIT")
+        semaphore = asyncio.Semaphore(max(1, VPS_TABS - 1))
         
-        Logger.log("保活", "刷新页面 (F5)...", "WAIT")
-        await self.page.reload()
-        await asyncio.sleep(5)
-        await self.handle_cloudflare(10)
-        await asyncio.sleep(2)
-        Logger.log("保活", "页面已刷新", "OK")
+        async def tab(url: str) -> dict:
+            async with semaphore:
+                try:
+                    return await self.keep_vps_tab(url)
+                except Exception as e:
+                    Logger.log("VPS", f"VPS #{vps_id(url)} 保活出错: {type(e).__name__}: {e}", "ERROR")
+                    return {'id': vps_id(url), 'url': url, 'status': None, 'expires': None, 'error': type(e).__name__}
+        
+        tasks = [asyncio.create_task(tab(u)) for u in others]
+        try:
+            await self.stay_and_refresh()
+        except BaseException:
+            # 主页面出错时取消仍在运行的标签页，避免上下文关闭后它们继续访问并在账号结束后报错
+            running = [task for task in tasks if not task.done()]
+            if running:
+                Logger.log("保活", f"主页面出错，取消 {len(running)} 个未完成的标签页", "WARN")
+            for task in running:
+                task.cancel()
+            raise
+        finally:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for url, task in zip(others, tasks):
+                if task.cancelled():
+                    self.vps_records.append({'id': vps_id(url), 'url': url, 'status': None, 'expires': None,
+                                             'error': 'cancelled'})
+                else:
+                    self.vps_records.append(task.result())
+            count('vps_tabs', len(others))
+    
+    async def stay_and_refresh(self, page=None):
+        # 标签页静默停留，只有主页面显示倒计时
+        quiet = page is not None
+        page = page or self.page
+        if not quiet:
+            Logger.log("保活", f"在 VPS 详情页停留 {STAY_DURATION} 秒...", "WAIT")
+        remaining = STAY_DURATION
+        while remaining > 0:
+            await asyncio.sleep(min(remaining, STAY_LOG_INTERVAL))
+            remaining -= STAY_LOG_INTERVAL
+            if not quiet and remaining > 0:
+                Logger.log("保活", f"剩余 {remaining} 秒...", "WAIT")
+        if not quiet:
+            Logger.log("保活", "停留完成", "OK")
+            Logger.log("保活", "刷新页面 (F5)...", "WAIT")
+        await rate_limiter.navigation()
+        await page.reload()
+        await self.settle(5, page=page)
+        await self.handle_cloudflare(10, page)
+        await self.settle(2, page=page)
+        Logger.log("保活", "页面已刷新" if not quiet else f"VPS #{vps_id(page.url)} 已刷新", "OK")
+    
+    async def release_page(self):
+        """页面用完后立即断开 CDP 并关闭页面，保存会话只需要 context"""
+        if self.cdp:
+            try:
+                await self.cdp.detach()
+            except Exception:
+                pass
+            self.cdp = None
+        if self.page:
+            await self.page.close()
+            self.page = None
     
     async def save_session(self):
-        cookies = await self.context.cookies()
-        with open(self.session_file, 'w') as f:
-            json.dump(cookies, f, indent=2)
+        # 完整 storage state (cookie + localStorage)，原子写入避免任务被杀时损坏
+        self.write_session(await self.context.storage_state())
+    
+    def write_session(self, state: dict):
+        now = time.time()
+        meta = dict(self.session['meta']) if self.session else {}
+        meta.update({
+            'user_agent': USER_AGENT,
+            'auth_expires': auth_cookie_expiry(state['cookies']),
+            'last_verified': now,
+            'saved_at': now,
+        })
+        if self.logged_in:
+            meta['last_login'] = now
+        self.session = {'storage_state': state, 'meta': meta, 'vps_urls': self.vps_urls,
+                        'vps_discovered_at': self.vps_discovered_at}
+        write_json_atomic(self.session_file, self.session)
         Logger.log("会话", f"会话已保存到 {self.session_file.name}", "OK")
     
-    async def load_session(self) -> bool:
-        if self.session_file.exists():
-            try:
-                with open(self.session_file) as f:
-                    cookies = json.load(f)
-                await self.context.add_cookies(cookies)
-                Logger.log("会话", "已加载保存的会话", "OK")
-                return True
-            except Exception as e:
-                Logger.log("会话", f"加载会话失败: {e}", "WARN")
-        return False
+    def load_session(self) -> dict:
+        """返回创建 BrowserContext 用的 storage state"""
+        if not self.session:
+            return None
+        self.vps_urls = self.session['vps_urls']
+        self.vps_discovered_at = self.session['vps_discovered_at']
+        Logger.log("会话", "已加载保存的会话", "OK")
+        return self.session['storage_state']
     
-    async def run(self) -> bool:
-        print()
-        print("-" * 60)
+    async def run(self, shared: 'SharedBrowser' = None, attempt: int = 0) -> bool:
+        trace = self.trace = get_run_report().account(self.email, attempt)
+        token = _current_trace.set(trace)
         Logger.log("账号", f"开始处理: {self.email}", "WAIT")
-        print("-" * 60)
-        
-        async with async_playwright() as p:
-            Logger.log("启动", "启动浏览器...")
-            self.browser = await p.chromium.launch(
-                headless=False,
-                args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-blink-features=AutomationControlled']
-            )
-            self.context = await self.browser.new_context(
-                viewport={'width': 1280, 'height': 900},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            )
-            self.page = await self.context.new_page()
-            self.cdp = await self.context.new_cdp_session(self.page)
-            Logger.log("启动", "浏览器已启动", "OK")
+        sampler = asyncio.create_task(self.sample_rss())
+        success = False
+        try:
+            success = await self.http_keepalive() or await self.run_with_browser(shared)
+            return success
+        except Exception as e:
+            # 单个账号的异常 (如 page.goto 超时) 只算本次失败，不影响其他账号
+            Logger.log("结果", f"{self.email} 在阶段 {self.phase or '启动'} 异常: {type(e).__name__}: {e}", "ERROR")
+            count(f"phase_error_{self.phase or 'browser_launch'}")
+            return False
+        finally:
+            sampler.cancel()
+            trace.finish(success)
+            if 'peak_rss_mb' in trace.counters:
+                Logger.log("资源", f"峰值内存 {trace.counters['peak_rss_mb']} MB")
+            _current_trace.reset(token)
+    
+    async def sample_rss(self):
+        """
+        每秒采样本进程及子进程 (Playwright 驱动、本地启动的 Chromium) 的内存，记录峰值
+        并发模式下浏览器共用，记录的是该账号运行期间整体的峰值
+        """
+        while True:
+            peak('peak_rss_mb', round(process_tree_rss(os.getpid()) / 1024 / 1024, 1))
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+    
+    async def http_keepalive(self) -> bool:
+        """
+        HTTP 快速路径: 带上保存的 cookie (含 cf_clearance) 与相同 UA 直接请求缓存的 VPS 详情页，
+        确认仍在登录状态并解析状态。遇到 Cloudflare 质询、登录跳转或请求出错时返回 False 改用浏览器
+        """
+        if not HTTP_FAST_PATH or not self.session or not self.session['vps_urls']:
+            return False
+        if session_status(self.session) == 'dead':
+            return False
+        if vps_list_stale(self.session['vps_discovered_at']):
+            # HTTP 路径只访问缓存的地址，列表过期时交给浏览器重新查找
+            return False
+        self.phase = 'http_fast_path'
+        with span('http_fast_path'):
+            Logger.log("HTTP", f"直接请求 {len(self.session['vps_urls'])} 个缓存的 VPS 详情页...", "WAIT")
+            cookies = [dict(c) for c in self.session['storage_state'].get('cookies', [])]
+            if CF_CLEARANCE_REUSE:
+                ip = await get_egress_ip()
+                fresh = clearance_store.load(ClearanceStore.key(USER_AGENT, ip)) if ip else []
+                names = {(c['name'], c['domain']) for c in fresh}
+                cookies = [c for c in cookies if (c['name'], c['domain']) not in names] + fresh
             
-            await self.load_session()
+            records = await self.http_fetch_all(cookies)
+            if records and HTTP_STAY > 0:
+                # 与浏览器路径一致: 停留后再请求一次 (刷新)
+                await asyncio.sleep(HTTP_STAY)
+                records = await self.http_fetch_all(cookies)
+            if not records:
+                return False
             
+            self.vps_urls = self.session['vps_urls']
+            self.vps_discovered_at = self.session['vps_discovered_at']
+            self.vps_records = records
+            self.write_session({'cookies': cookies, 'origins': self.session['storage_state'].get('origins', [])})
+            count('http_fast_path_ok')
+            if self.token_pool and self.predicted_login:
+                self.token_pool.skip()
+            Logger.log("结果", f"{self.email} 保活完成 (HTTP)!", "OK")
+            return True
+    
+    async def http_fetch_all(self, cookies: list):
+        """并发请求全部详情页，全部成功时返回记录列表，否则返回 None"""
+        results = await asyncio.gather(*(self.http_fetch_vps(url, cookies) for url in self.session['vps_urls']),
+                                       return_exceptions=True)
+        records = []
+        for url, result in zip(self.session['vps_urls'], results):
+            if isinstance(result, Exception):
+                result = (None, 'error')
+                Logger.log("HTTP", f"请求 {url} 出错", "WARN")
+            record, reason = result
+            if reason:
+                count(f'http_escalations_{reason}')
+                if reason == 'login':
+                    self.known_logged_out = True
+                Logger.log("HTTP", {'challenge': "遇到 Cloudflare 质询", 'login': "会话已失效 (跳转登录)",
+                                    'unrecognized': "页面中没有 VPS 状态"}.get(
+                    reason, f"请求失败 ({reason})") + "，改用浏览器", "WARN")
+                return None
+            records.append(record)
+        for record in records:
+            label = f"VPS #{record['id']}" if record['id'] else "VPS"
+            expires = f"，到期 {record['expires']}" if record['expires'] else ""
+            Logger.log("VPS", f"{label} 状态: {record['status'] or '未知'}{expires}",
+                       "WARN" if record['status'] == 'OFFLINE' else "OK")
+        return records
+    
+    async def http_fetch_vps(self, url: str, cookies: list) -> tuple:
+        """请求一个详情页，返回 (记录, None) 或 (None, 改用浏览器的原因)"""
+        session = get_http_session()
+        for _ in range(3):
+            headers = {**HTTP_HEADERS, 'Cookie': cookie_header(cookies, url)}
+            await rate_limiter.navigation()
+            async with session.get(url, headers=headers, allow_redirects=False) as response:
+                data = await response.read()
+                merge_set_cookies(cookies, response, url)
+            count('http_requests')
+            count('http_bytes', len(data))
+            body = data.decode(errors='replace')
+            if response.status in (301, 302, 303, 307, 308):
+                # 站内跳转 (如补全斜杠) 继续跟随；只有服务端跳到登录页才确定会话失效，
+                # 跳出用户中心的其他情况交给浏览器按正常流程检查
+                location = urljoin(url, response.headers.get('Location', ''))
+                if 'login' in location.lower():
+                    return None, 'login'
+                if '/customer/' not in location:
+                    return None, 'redirect'
+                url = location
+                continue
+            challenged = response.status in (403, 503) and (
+                'Just a moment' in body or response.headers.get('cf-mitigated') == 'challenge')
+            rate_limiter.observe(challenged)
+            if challenged:
+                return None, 'challenge'
+            if response.status != 200:
+                return None, f'http_{response.status}'
+            record = {'id': vps_id(url), 'url': url, **parse_vps_html(body)}
+            if '/customer/' not in urlsplit(url).path or not record['status']:
+                # 找不到 VPS 状态说明多半不是详情页 (也可能是未登录的页面)，交给浏览器确认
+                return None, 'unrecognized'
+            return record, None
+        return None, 'redirects'
+    
+    async def run_with_browser(self, shared: 'SharedBrowser' = None) -> bool:
+        if shared:
+            # 并发模式: 共用浏览器，每个账号独立 BrowserContext
+            return await self.run_in_browser(await shared.get())
+        
+        shared = SharedBrowser()
+        try:
+            return await self.run_in_browser(await shared.get())
+        finally:
+            await shared.close()
+    
+    def on_login_page(self) -> bool:
+        url = self.page.url
+        return 'login' in url.lower() or 'customer' not in url
+    
+    async def check_login_needed(self) -> bool:
+        if self.known_logged_out:
+            Logger.log("检查", "HTTP 请求已确认会话失效，直接登录", "WARN")
+            return True
+        status = session_status(self.session)
+        if status == 'dead':
+            Logger.log("检查", "会话已失效 (无会话或登录 cookie 已过期)，直接登录", "WARN")
+            return True
+        if status == 'good':
+            Logger.log("检查", "会话近期已验证有效，跳过 Dashboard 探测", "OK")
+            return False
+        
+        self.phase = 'session_probe'
+        with span('session_probe'):
             Logger.log("检查", "检查登录状态...", "WAIT")
-            await self.page.goto(DASHBOARD_URL, wait_until='domcontentloaded')
-            await asyncio.sleep(5)
+            await self.goto(self.page, DASHBOARD_URL, wait_until='domcontentloaded')
+            await self.settle(5)
             
             cf_passed = await self.handle_cloudflare()
             if cf_passed:
                 Logger.log("检查", "Cloudflare 验证通过", "OK")
-            await asyncio.sleep(2)
+            await self.settle(2)
+        
+        if self.on_login_page():
+            Logger.log("检查", "需要登录", "WARN")
+            return True
+        Logger.log("检查", "会话有效，已登录", "OK")
+        return False
+    
+    async def do_login(self) -> bool:
+        self.phase = 'login'
+        with span('login'):
+            async with rate_limiter.login():
+                self.logged_in = await self.login()
+        if not self.logged_in:
+            Logger.log("结果", "登录失败，任务终止", "ERROR")
+        return self.logged_in
+    
+    async def run_in_browser(self, browser) -> bool:
+        self.browser = browser
+        try:
+            self.phase = 'context_setup'
+            with span('context_setup'):
+                self.context = await self.browser.new_context(
+                    viewport=VIEWPORT,
+                    user_agent=USER_AGENT,
+                    storage_state=self.load_session()
+                )
+                await self.install_modal_dismisser()
+                self.page = await self.context.new_page()
+                self.cdp = await self.context.new_cdp_session(self.page)
+                Logger.log("启动", "浏览器已启动", "OK")
+                
+                await self.watch_clearance()
+                await self.install_network_filter()
+                await self.apply_clearance()
             
-            current_url = self.page.url
-            need_login = 'login' in current_url.lower() or '#login' in current_url or 'customer' not in current_url
+            if await self.check_login_needed() and not await self.do_login():
+                return False
             
-            if need_login:
-                Logger.log("检查", "需要登录", "WARN")
-                if not await self.login():
-                    Logger.log("结果", "登录失败，任务终止", "ERROR")
-                    await self.browser.close()
+            self.phase = 'vps_detail'
+            with span('vps_detail'):
+                visited = await self.visit_vps_detail()
+            if not visited and not self.logged_in and self.on_login_page():
+                # 元数据认为有效，实际会话已被服务端注销
+                Logger.log("检查", "会话实际已失效，重新登录", "WARN")
+                if not await self.do_login():
                     return False
-            else:
-                Logger.log("检查", "会话有效，已登录", "OK")
-            
-            if not await self.visit_vps_detail():
+                self.phase = 'vps_detail'
+                with span('vps_detail'):
+                    visited = await self.visit_vps_detail()
+            if not visited:
                 Logger.log("结果", "访问 VPS 详情页失败", "ERROR")
-                await self.browser.close()
                 return False
+            if not self.logged_in and self.token_pool and self.predicted_login:
+                self.token_pool.skip()
             
-            await self.stay_and_refresh()
-            await self.save_session()
+            # 已进入 VPS 详情页即视为保活成功，之后的阶段出错只记录警告
+            for name, step in (('stay_refresh', self.stay_all), ('release_page', self.release_page),
+                               ('save_session', self.save_session)):
+                self.phase = name
+                try:
+                    with span(name):
+                        await step()
+                except Exception as e:
+                    Logger.log("结果", f"阶段 {name} 出错 (不影响保活结果): {type(e).__name__}: {e}", "WARN")
+                    count(f"phase_error_{name}")
             
+            failed = [r['id'] for r in self.vps_records if r.get('error')]
+            if failed:
+                Logger.log("结果", f"VPS {', '.join(f'#{i}' for i in failed)} 未能保活", "ERROR")
+                return False
             Logger.log("结果", f"{self.email} 保活完成!", "OK")
-            
-            await self.browser.close()
             return True
+        finally:
+            if self.context:
+                self.report_network()
+                await self.context.close()
+
+
+async def launch_browser(p):
+    return await p.chromium.launch(headless=False, args=browser_args())
+
+
+async def acquire_daemon_browser(p):
+    """向常驻浏览器服务申请浏览器，返回 (browser, lease)，服务不可用时返回 (None, None)"""
+    import aiohttp
+    lease = None
+    try:
+        timeout = aiohttp.ClientTimeout(total=30, sock_connect=2)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.post(f"{DAEMON_URL}/acquire") as response:
+                response.raise_for_status()
+                data = await response.json()
+        lease = data['lease']
+        browser = await p.chromium.connect_over_cdp(data['ws'], timeout=15000)
+        return browser, lease
+    except Exception as e:
+        Logger.log("启动", f"常驻浏览器不可用，改为本地启动: {e}", "WARN")
+        if lease:
+            await release_daemon_browser(lease)
+        return None, None
+
+
+async def release_daemon_browser(lease: str):
+    import aiohttp
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            async with session.post(f"{DAEMON_URL}/release", json={'lease': lease}) as response:
+                await response.read()
+    except Exception as e:
+        Logger.log("启动", f"归还常驻浏览器失败: {e}", "WARN")
+
+
+class SharedBrowser:
+    """
+    账号使用的浏览器，首次使用时才启动 Playwright 并获取: 设置了 ZAP_DAEMON_URL 时连接常驻服务，
+    否则 (或服务不可用时) 本地启动。并发模式下所有账号共用一个；全部账号走 HTTP 快速路径时不会启动
+    """
+    
+    def __init__(self):
+        self.playwright = None
+        self.browser = None
+        self.lease = None
+        self._lock = asyncio.Lock()
+    
+    async def get(self):
+        async with self._lock:
+            if self.browser is None or not self.browser.is_connected():
+                await self.release()
+                with span('browser_launch'):
+                    if self.playwright is None:
+                        from playwright.async_api import async_playwright
+                        self.playwright = await async_playwright().start()
+                    if DAEMON_URL:
+                        self.browser, self.lease = await acquire_daemon_browser(self.playwright)
+                        if self.browser:
+                            Logger.log("启动", "已连接常驻浏览器", "OK")
+                    if self.browser is None:
+                        Logger.log("启动", "启动浏览器...")
+                        self.browser = await launch_browser(self.playwright)
+                        Logger.log("启动", "浏览器已启动", "OK")
+            return self.browser
+    
+    async def release(self):
+        # 连接常驻服务时 close() 只关闭本次创建的 context 并断开，不会退出 Chromium
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self.lease:
+            await release_daemon_browser(self.lease)
+            self.lease = None
+    
+    async def close(self):
+        await self.release()
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+
+class BrowserDaemon:
+    """
+    常驻浏览器服务: 保持一个开启 DevTools 端口的 Chromium，供定时任务通过 CDP 连接
+    
+    控制接口 (仅监听 127.0.0.1):
+        POST /acquire  -> {ws, lease}  申请使用，返回 CDP 地址与租约
+        POST /release  {lease}         归还
+        GET  /status                   进程、运行次数、内存
+    没有租约在用时，运行次数或内存超过阈值会重启 Chromium；进程意外退出时自动拉起
+    """
+    
+    def __init__(self, executable: str):
+        self.executable = executable
+        self.proc = None
+        self.profile = None
+        self.ws_url = None
+        self.runs = 0
+        self.leases = {}  # lease -> 失效时间
+        self._lock = asyncio.Lock()
+        self._maintain_task = None  # 归还租约后在后台执行的 maintain()
+    
+    async def start_browser(self):
+        self.profile = DAEMON_PROFILE or tempfile.mkdtemp(prefix='zap-chromium-')
+        Path(self.profile).mkdir(parents=True, exist_ok=True)
+        args = [self.executable, *browser_args(direct=True),
+                f'--remote-debugging-port={DAEMON_CDP_PORT}', '--remote-debugging-address=127.0.0.1',
+                f'--user-data-dir={self.profile}', '--no-first-run', '--no-default-browser-check', 'about:blank']
+        self.proc = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        
+        # 等待 DevTools 端口就绪
+        import aiohttp
+        deadline = time.monotonic() + 30
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=2)) as session:
+            while True:
+                try:
+                    async with session.get(f"http://127.0.0.1:{DAEMON_CDP_PORT}/json/version") as response:
+                        self.ws_url = (await response.json(content_type=None))['webSocketDebuggerUrl']
+                        break
+                except Exception:
+                    if self.proc.returncode is not None or time.monotonic() > deadline:
+                        await self.stop_browser()
+                        raise RuntimeError("Chromium 启动失败")
+                    await asyncio.sleep(0.2)
+        self.runs = 0
+        Logger.log("服务", f"Chromium 已启动 (pid {self.proc.pid})", "OK")
+    
+    async def stop_browser(self):
+        if self.proc and self.proc.returncode is None:
+            self.proc.terminate()
+            try:
+                await asyncio.wait_for(self.proc.wait(), 10)
+            except asyncio.TimeoutError:
+                self.proc.kill()
+                await self.proc.wait()
+        if self.profile and not DAEMON_PROFILE:
+            shutil.rmtree(self.profile, ignore_errors=True)
+        self.proc = None
+        self.profile = None
+        self.ws_url = None
+    
+    def rss_mb(self) -> float:
+        return process_tree_rss(self.proc.pid) / 1024 / 1024 if self.proc else 0
+    
+    def recycle_reason(self):
+        if self.runs >= DAEMON_MAX_RUNS:
+            return f"已运行 {self.runs} 次"
+        rss = self.rss_mb()
+        if rss > DAEMON_MAX_RSS_MB:
+            return f"内存 {rss:.0f} MB"
+        return None
+    
+    async def maintain(self):
+        """清理过期租约；进程不在时拉起，空闲且超过阈值时回收"""
+        async with self._lock:
+            now = time.monotonic()
+            self.leases = {k: v for k, v in self.leases.items() if v > now}
+            if self.proc is None or self.proc.returncode is not None:
+                await self.start_browser()
+                return
+            if not self.leases:
+                reason = self.recycle_reason()
+                if reason:
+                    Logger.log("服务", f"回收 Chromium ({reason})", "WAIT")
+                    await self.stop_browser()
+                    await self.start_browser()
+    
+    async def handle_acquire(self, request):
+        from aiohttp import web
+        try:
+            await self.maintain()
+        except RuntimeError as e:
+            return web.json_response({'error': str(e)}, status=503)
+        lease = secrets.token_hex(8)
+        self.leases[lease] = time.monotonic() + DAEMON_LEASE_SECONDS
+        Logger.log("服务", f"租约 {lease} 已发放 (使用中 {len(self.leases)})")
+        return web.json_response({'ws': self.ws_url, 'lease': lease})
+    
+    async def handle_release(self, request):
+        from aiohttp import web
+        data = await request.json()
+        if self.leases.pop(data.get('lease'), None) is not None:
+            self.runs += 1
+            Logger.log("服务", f"租约 {data['lease']} 已归还 (累计 {self.runs} 次)")
+            if self._maintain_task is None or self._maintain_task.done():
+                # 保存任务引用避免被回收，失败时记录日志 (下次 acquire 或定时检查会再次尝试)
+                self._maintain_task = asyncio.create_task(self.maintain())
+                self._maintain_task.add_done_callback(self._maintain_done)
+        return web.json_response({'ok': True})
+    
+    @staticmethod
+    def _maintain_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            Logger.log("服务", f"后台维护失败: {task.exception()}", "ERROR")
+    
+    async def handle_status(self, request):
+        from aiohttp import web
+        return web.json_response({
+            'pid': self.proc.pid if self.proc else None,
+            'runs': self.runs,
+            'leases': len(self.leases),
+            'rss_mb': round(self.rss_mb(), 1),
+        })
+    
+    async def serve(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_post('/acquire', self.handle_acquire)
+        app.router.add_post('/release', self.handle_release)
+        app.router.add_get('/status', self.handle_status)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await self.maintain()
+            await web.TCPSite(runner, '127.0.0.1', DAEMON_PORT).start()
+            Logger.log("服务", f"常驻浏览器服务已启动: http://127.0.0.1:{DAEMON_PORT}", "OK")
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), 30)
+                except asyncio.TimeoutError:
+                    try:
+                        await self.maintain()
+                    except RuntimeError as e:
+                        Logger.log("服务", str(e), "ERROR")
+        finally:
+            await runner.cleanup()
+            if self._maintain_task and not self._maintain_task.done():
+                self._maintain_task.cancel()
+                await asyncio.gather(self._maintain_task, return_exceptions=True)
+            await self.stop_browser()
+            Logger.log("服务", "常驻浏览器服务已停止")
+
+
+async def run_daemon():
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        executable = p.chromium.executable_path
+    await BrowserDaemon(executable).serve()
+
+
+def retry_delay(attempt: int) -> float:
+    """第 attempt 次重试前的等待: 指数增长并乘以 0.5~1.5 的随机抖动，避免多个账号同时重试"""
+    return min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+
+def log_result(result: dict, keeper: 'ZapKeepAlive', attempt: int, done: int, total: int):
+    """账号最终完成时立即输出一条结果记录 (json 格式为 event=account_result)"""
+    duration = keeper.trace.duration if keeper.trace else None
+    vps = ", ".join(f"#{v['id']} {v['status'] or '?'}" for v in result['vps'])
+    msg = (f"{result['email']} {'成功' if result['success'] else '失败'}" + (f" ({vps})" if vps else "")
+           + (f"，用时 {duration:.1f} 秒" if duration is not None else "")
+           + (f"，重试 {attempt} 次" if attempt else "") + f" [{done}/{total}]")
+    Logger.log("进度", msg, "OK" if result['success'] else "ERROR", event='account_result', **result,
+               retries=attempt, duration=duration, phase_failed=None if result['success'] else keeper.phase,
+               done=done, total=total)
+
+
+async def run_accounts(accounts: list, concurrency: int, token_pool: CaptchaTokenPool = None,
+                       checkpoint: Checkpoint = None) -> list:
+    """
+    按并发数处理账号，失败的账号退避后重新排队
+    
+    队列按可运行时间排序，等待重试的账号不占用并发名额；整次运行的重试次数受
+    ZAP_RETRY_BUDGET 限制，账号密码错误不重试。账号最终完成 (成功或重试用尽) 时写入断点
+    """
+    results = {}
+    queue = [(0.0, i, 0, a) for i, a in enumerate(accounts)]  # (可运行时间, 序号, 已重试次数, 账号)
+    heapq.heapify(queue)
+    in_flight = 0
+    cond = asyncio.Condition()
+    budget = RETRY_BUDGET
+    
+    async def next_item():
+        nonlocal in_flight
+        async with cond:
+            while True:
+                now = time.monotonic()
+                if queue and queue[0][0] <= now:
+                    in_flight += 1
+                    return heapq.heappop(queue)
+                if not queue and not in_flight:
+                    return None
+                try:
+                    await asyncio.wait_for(cond.wait(), queue[0][0] - now if queue else None)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def worker():
+        nonlocal in_flight, budget
+        while True:
+            item = await next_item()
+            if item is None:
+                return
+            _, seq, attempt, account = item
+            retry = None
+            try:
+                if attempt:
+                    Logger.log("进度", f"重试账号 {account['email']} (第 {attempt}/{MAX_RETRIES} 次)")
+                else:
+                    Logger.log("进度", f"处理账号 {seq + 1}/{len(accounts)}: {account['email']}")
+                if concurrency > 1 and not attempt and seq:
+                    # 错开并发账号的开始时间，避免同时打到 Cloudflare
+                    await asyncio.sleep(random.uniform(0, START_JITTER))
+                keeper = ZapKeepAlive(account['email'], account['password'], token_pool)
+                # 并发模式共用浏览器，逐个模式每个账号独立启动
+                own = None if concurrency > 1 else SharedBrowser()
+                try:
+                    success = await keeper.run(own or shared, attempt)
+                except Exception as e:
+                    # 单个账号异常不能中断其他账号
+                    Logger.log("结果", f"{account['email']} 异常: {e}", "ERROR")
+                    success = False
+                finally:
+                    if own:
+                        await own.close()
+                if not success and keeper.retryable and attempt < MAX_RETRIES and budget > 0:
+                    budget -= 1
+                    delay = retry_delay(attempt + 1)
+                    Logger.log("重试", f"{account['email']} 将在 {delay:.0f} 秒后重试 (剩余重试额度 {budget})", "WAIT")
+                    retry = (time.monotonic() + delay, seq, attempt + 1, account)
+                else:
+                    result = results[account['email']] = {
+                        'email': account['email'], 'success': success,
+                        'vps': [{k: r.get(k) for k in ('id', 'status', 'expires')} for r in keeper.vps_records]}
+                    # 台账按账号最终结果记录一次，重试中间的失败不计入连续失败次数
+                    run_ledger.record(account['email'], success, keeper.vps_status, keeper.vps_records)
+                    if checkpoint:
+                        checkpoint.mark(account['email'], success)
+                    log_result(result, keeper, attempt, len(results), len(accounts))
+            finally:
+                async with cond:
+                    in_flight -= 1
+                    if retry:
+                        heapq.heappush(queue, retry)
+                    cond.notify_all()
+    
+    shared = SharedBrowser()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await shared.close()
+    # 保持账号原始顺序，汇总与通知顺序稳定
+    return [results.get(a['email'], {'email': a['email'], 'success': False}) for a in accounts]
 
 
 async def main():
-    if not YESCAPTCHA_API_KEY:
-        print("警告: 未设置 YESCAPTCHA_API_KEY 环境变量，登录时可能无法自动解决验证码")
+    report = get_run_report()
+    _current_trace.set(report.run)
+    success = False
+    try:
+        success = await run_all()
+        return success
+    finally:
+        await close_captcha_solver()
+        await close_http_session()
+        report.run.finish(success)
+        report.write()
+
+
+async def run_all():
+    if not get_captcha_solver():
+        Logger.log("配置", "未设置 YESCAPTCHA_API_KEY 等打码平台密钥，登录时可能无法自动解决验证码", "WARN")
     
     if not ACCOUNTS_STR:
-        print("错误: 未设置 ZAP_ACCOUNT 环境变量")
+        Logger.log("配置", f"未设置 {' / '.join(ACCOUNT_ENV_NAMES)} 环境变量", "ERROR")
         exit(1)
     
     accounts = parse_accounts(ACCOUNTS_STR)
     if not accounts:
-        print("错误: 无有效账号配置")
+        Logger.log("配置", "无有效账号配置", "ERROR")
         exit(1)
     
+    if SHARD_COUNT > 1:
+        if not 0 <= SHARD_INDEX < SHARD_COUNT:
+            Logger.log("配置", f"ZAP_SHARD_INDEX 应在 0~{SHARD_COUNT - 1} 之间", "ERROR")
+            exit(1)
+        total = len(accounts)
+        accounts = select_shard(accounts, SHARD_INDEX, SHARD_COUNT)
+        Logger.log("分片", f"分片 {SHARD_INDEX}/{SHARD_COUNT}: 处理 {len(accounts)}/{total} 个账号")
+        if not accounts:
+            write_shard_results([], skipped=True)
+            return True
+    
+    # 上次运行被中断时，跳过断点中已完成的账号，结果并入本次汇总
+    checkpoint = Checkpoint(CHECKPOINT_FILE)
+    emails = {a['email'] for a in accounts}
+    resumed = [{'email': e, 'success': ok} for e, ok in checkpoint.resume().items() if e in emails]
+    if resumed:
+        Logger.log("断点", f"从断点续跑: {len(resumed)} 个账号上次已完成，本次跳过", "OK")
+        done = {r['email'] for r in resumed}
+        accounts = [a for a in accounts if a['email'] not in done]
+    
+    skipped = 0
+    if MIN_INTERVAL_HOURS > 0:
+        due = run_ledger.due(accounts)
+        skipped = len(accounts) - len(due)
+        accounts = due
+        if not accounts and not resumed:
+            # 没有到期的账号: 不启动浏览器、不发送通知
+            Logger.log("台账", f"{skipped} 个账号均未到期 (间隔 {MIN_INTERVAL_HOURS:g} 小时)，本次跳过", "OK")
+            if SHARD_COUNT > 1:
+                write_shard_results([], skipped=True)
+            return True
+    
+    results = await run_pending(accounts, skipped, checkpoint) if accounts else []
+    results = resumed + results
+    checkpoint.clear()
+    
+    if SHARD_COUNT > 1:
+        # 分片运行只写部分结果，汇总通知由 merge 统一发送
+        write_shard_results(results)
+        print_summary(results)
+        return all(r['success'] for r in results)
+    return report_results(results)
+
+
+async def run_pending(accounts: list, skipped: int, checkpoint: Checkpoint) -> list:
+    concurrency = min(ZAP_CONCURRENCY, len(accounts))
+    lines = [f"账号数量: {len(accounts)}" + (f" (分片 {SHARD_INDEX}/{SHARD_COUNT})" if SHARD_COUNT > 1 else "")]
+    if skipped:
+        lines.append(f"未到期跳过: {skipped}")
+    lines += [
+        f"停留时间: {STAY_DURATION} 秒",
+        f"失败重试: 每个账号最多 {MAX_RETRIES} 次，本次共 {RETRY_BUDGET} 次",
+        f"并发数量: {concurrency}",
+        f"限速: 每分钟导航 {NAV_PER_MIN:g} 次、登录 {LOGIN_PER_MIN:g} 次，同时登录 {LOGIN_CONCURRENCY} 个",
+        f"开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+    ]
+    Logger.block("ZAP-Hosting Lifetime VPS 保活脚本", lines, event='run_start', accounts=len(accounts),
+                 skipped=skipped, concurrency=concurrency, shard=SHARD_INDEX, shard_count=SHARD_COUNT)
+    
+    token_pool = None
+    solver = get_captcha_solver()
+    if solver and CAPTCHA_PREFETCH:
+        expected = sum(1 for a in accounts if session_likely_stale(get_session_file(a['email'])))
+        # 登录受 ZAP_LOGIN_CONCURRENCY 限制，预取更多只会让 token 在排队时过期
+        token_pool = CaptchaTokenPool(solver, RECAPTCHA_SITEKEY, LOGIN_URL, expected,
+                                      CAPTCHA_PREFETCH_MAX or min(concurrency, LOGIN_CONCURRENCY))
+        token_pool.start()
+    
+    try:
+        return await run_accounts(accounts, concurrency, token_pool, checkpoint)
+    finally:
+        if token_pool:
+            await token_pool.close()
+
+
+def write_shard_results(results: list, skipped: bool = False):
+    """写入本分片结果；skipped 表示本分片没有处理任何账号 (无账号或均未到期)"""
+    path = RESULTS_DIR / f"shard-{SHARD_INDEX}.json"
+    write_json_atomic(path, {
+        'shard': SHARD_INDEX,
+        'shard_count': SHARD_COUNT,
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'skipped': skipped,
+        'results': results,
+    })
+    Logger.log("分片", f"分片 {SHARD_INDEX}/{SHARD_COUNT} 结果已写入 {path}", "OK")
+
+
+def merge_shard_results() -> bool:
+    """汇总各分片结果并发送一条通知；缺失的分片按失败处理，所有分片都跳过时不通知"""
+    results, seen, shard_count, processed = [], set(), SHARD_COUNT, False
+    for path in sorted(RESULTS_DIR.glob('shard-*.json')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            Logger.log("分片", f"读取 {path.name} 失败: {e}", "WARN")
+            continue
+        seen.add(data['shard'])
+        shard_count = max(shard_count, data['shard_count'])
+        processed = processed or not data.get('skipped', False)
+        results.extend(data['results'])
     
-    print()
-    print("=" * 60)
-    print("  ZAP-Hosting Lifetime VPS 保活脚本")
-    print("=" * 60)
-    print(f"  账号数量: {len(accounts)}")
-    print(f"  停留时间: {STAY_DURATION} 秒")
-    print(f"  开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
-    
-    results = []
-    for i, account in enumerate(accounts, 1):
-        print(f"\n[进度] 处理账号 {i}/{len(accounts)}")
-        keeper = ZapKeepAlive(account['email'], account['password'])
-        success = await keeper.run()
-        results.append({'email': account['email'], 'success': success})
-    
-    print()
-    print("=" * 60)
-    print("  📊 任务汇总")
-    print("=" * 60)
+    missing = [i for i in range(shard_count) if i not in seen]
+    if not missing and not processed:
+        # 与单机运行一致: 没有到期的账号时不发送通知
+        Logger.log("分片", "所有分片均未处理账号，本次不发送通知", "OK")
+        return True
+    if missing:
+        Logger.log("分片", f"分片 {', '.join(map(str, missing))} 未上报结果", "ERROR")
+        # 有账号配置时把缺失分片的账号记为失败，否则只能在通知中注明分片序号
+        for account in parse_accounts(ACCOUNTS_STR):
+            if account_shard(account['email'], shard_count) in missing:
+                results.append({'email': account['email'], 'success': False})
+    # 按账号配置顺序汇总，与单机运行的通知一致 (不在配置中的排在最后)
+    order = {}
+    for i, account in enumerate(parse_accounts(ACCOUNTS_STR)):
+        order.setdefault(account['email'], i)
+    results.sort(key=lambda r: order.get(r['email'], len(order)))
+    return report_results(results, missing)
+
+
+def print_summary(results: list):
     success_count = sum(1 for r in results if r['success'])
-    for r in results:
-        status = "✓ 成功" if r['success'] else "✗ 失败"
-        print(f"  {status}: {r['email']}")
-    print("-" * 60)
-    print(f"  总计: {success_count}/{len(results)} 成功")
-    print(f"  完成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
-    print()
+    lines = [f"{'✓ 成功' if r['success'] else '✗ 失败'}: {r['email']}" for r in results]
+    lines += [None, f"总计: {success_count}/{len(results)} 成功",
+              f"完成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"]
+    Logger.block("📊 任务汇总", lines, event='summary', success=success_count, total=len(results),
+                 failed=[r['email'] for r in results if not r['success']])
+
+
+def report_results(results: list, missing_shards: list = ()) -> bool:
+    """打印汇总并发送通知，全部成功 (且没有缺失的分片) 时返回 True"""
+    print_summary(results)
     
     # 发送汇总通知
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    if success_count == len(results):
+    success_count = sum(1 for r in results if r['success'])
+    all_success = success_count == len(results) and not missing_shards
+    if all_success:
         notify_title = "ZAP 保活成功"
         emoji = "✅"
     elif success_count > 0:
@@ -581,17 +2965,160 @@ async def main():
     msg_lines = [f"{emoji} {notify_title}", ""]
     for r in results:
         status = "✅" if r['success'] else "❌"
-        msg_lines.append(f"{status} {r['email']}")
+        vps = ", ".join(f"#{v['id']} {v['status'] or '?'}" for v in r.get('vps') or [])
+        msg_lines.append(f"{status} {r['email']}" + (f" ({vps})" if vps else ""))
     msg_lines.append("")
     msg_lines.append(f"📊 结果: {success_count}/{len(results)} 成功")
+    if missing_shards:
+        msg_lines.append(f"⚠️ 未上报的分片: {', '.join(map(str, missing_shards))}")
     msg_lines.append(f"🕒 时间: {now}")
     
     message = "\n".join(msg_lines)
     notify_send(notify_title, message)
     
-    return success_count == len(results)
+    return all_success
+
+
+# ==================== 命令行 ====================
+def describe_session(session_file: Path) -> dict:
+    """会话文件概况: 状态、保存时长、登录 cookie 剩余有效期、缓存的 VPS 数"""
+    info = {'file': session_file.name, 'state': 'missing'}
+    if not session_file.exists():
+        return info
+    data = load_session_data(session_file)
+    if data is None:
+        info['state'] = 'corrupt'
+        return info
+    now = time.time()
+    meta = data['meta']
+    cookies = data['storage_state'].get('cookies', [])
+    expiry = auth_cookie_expiry(cookies)
+    saved_at = meta.get('saved_at') or session_file.stat().st_mtime
+    info.update({
+        'state': session_status(data),
+        'saved_hours_ago': round((now - saved_at) / 3600, 1),
+        'verified_hours_ago': round((now - meta['last_verified']) / 3600, 1) if meta.get('last_verified') else None,
+        'auth_cookies': len(auth_cookies(cookies)),
+        'auth_expires_hours': round((expiry - now) / 3600, 1) if expiry else None,
+        'vps': len(data['vps_urls']),
+    })
+    return info
+
+
+def format_session(info: dict) -> str:
+    if info['state'] in ('missing', 'corrupt'):
+        return {'missing': "没有会话文件，运行时需要登录", 'corrupt': "会话文件损坏，运行时需要登录"}[info['state']]
+    if not info['auth_cookies']:
+        cookie = "没有登录 cookie"
+    elif info['auth_expires_hours'] is None:
+        cookie = "登录 cookie 为会话 cookie"
+    elif info['state'] == 'dead':
+        cookie = "登录 cookie 已过期"
+    elif info['auth_expires_hours'] >= 48:
+        cookie = f"登录 cookie 剩余 {info['auth_expires_hours'] / 24:.1f} 天"
+    else:
+        cookie = f"登录 cookie 剩余 {info['auth_expires_hours']:g} 小时"
+    verified = f"，{info['verified_hours_ago']:g} 小时前确认有效" if info['verified_hours_ago'] is not None else ""
+    return f"会话 {info['state']}，{info['saved_hours_ago']:g} 小时前保存{verified}，{cookie}，缓存 {info['vps']} 个 VPS"
+
+
+def check_config() -> bool:
+    """不启动浏览器检查配置、账号与会话状态，存在会导致运行失败的问题时返回 False"""
+    ok = True
+    
+    def problem(msg: str, status: str = "ERROR"):
+        nonlocal ok
+        ok = ok and status != "ERROR"
+        Logger.log("检查", msg, status)
+    
+    for module in ('playwright', 'aiohttp'):
+        if importlib.util.find_spec(module) is None:
+            problem(f"未安装 {module} (pip install -r requirements.txt)")
+    if not HEADLESS and not os.environ.get('DISPLAY'):
+        problem("没有 DISPLAY: 需要用 xvfb-run 运行，或设置 ZAP_HEADLESS=1", "WARN")
+    providers = [name for name, (_, key, *_) in CAPTCHA_PROVIDERS.items() if key]
+    if providers:
+        Logger.log("检查", f"打码平台: {', '.join(providers)}", "OK")
+    else:
+        problem("未配置打码平台密钥，会话失效时无法自动登录", "WARN")
+    if LOG_FORMAT not in ('human', 'json'):
+        problem(f"ZAP_LOG_FORMAT={LOG_FORMAT} 无效，应为 human 或 json", "WARN")
+    if SHARD_COUNT > 1 and not 0 <= SHARD_INDEX < SHARD_COUNT:
+        problem(f"ZAP_SHARD_INDEX 应在 0~{SHARD_COUNT - 1} 之间")
+    
+    if not ACCOUNTS_ENV:
+        problem(f"未设置 {' / '.join(ACCOUNT_ENV_NAMES)} 环境变量")
+        return ok
+    items = [item.strip() for item in ACCOUNTS_STR.split(',') if item.strip()]
+    accounts = parse_accounts(ACCOUNTS_STR)
+    for item in items:
+        if ':' not in item:
+            problem(f"账号配置 {item[:3]}*** 缺少 ':' 分隔的密码，已忽略")
+    for a in accounts:
+        if not a['email'] or not a['password']:
+            problem(f"账号 {a['email'] or '(空邮箱)'} 的邮箱或密码为空")
+    emails = [a['email'] for a in accounts]
+    for email in sorted({e for e in emails if emails.count(e) > 1}):
+        problem(f"账号 {email} 重复配置", "WARN")
+    if not accounts:
+        problem(f"{ACCOUNTS_ENV} 中没有有效账号")
+        return ok
+    Logger.log("检查", f"从 {ACCOUNTS_ENV} 读取到 {len(accounts)} 个账号", "OK")
+    
+    now = time.time()
+    for a in {a['email']: a for a in accounts}.values():
+        info = describe_session(get_session_file(a['email']))
+        entry = run_ledger.get(a['email'])
+        extra = ""
+        if SHARD_COUNT > 1:
+            extra += f"，分片 {account_shard(a['email'], SHARD_COUNT)}"
+        if entry.get('last_success'):
+            extra += f"，上次成功 {(now - entry['last_success']) / 3600:.1f} 小时前"
+        if entry.get('failures'):
+            extra += f"，连续失败 {entry['failures']} 次"
+        status = {'good': "OK", 'unknown': "INFO"}.get(info['state'], "WARN")
+        Logger.log("会话", f"{a['email']}: {format_session(info)}{extra}", status,
+                   event='session', email=a['email'], **info, ledger=entry)
+    return ok
+
+
+def list_sessions():
+    """列出会话目录中的全部会话文件 (含已不在账号配置中的)"""
+    emails = {get_session_file(a['email']).name: a['email'] for a in parse_accounts(ACCOUNTS_STR)}
+    files = sorted(SESSION_DIR.glob('*_at_*.json'))
+    if not files:
+        Logger.log("会话", f"{SESSION_DIR} 中没有会话文件")
+        return
+    for path in files:
+        info = describe_session(path)
+        name = emails.get(path.name, f"{path.stem} (未配置)")
+        status = {'good': "OK", 'unknown': "INFO"}.get(info['state'], "WARN")
+        Logger.log("会话", f"{name}: {format_session(info)}", status,
+                   event='session', email=emails.get(path.name), **info)
+
+
+def cli() -> int:
+    parser = argparse.ArgumentParser(description='ZAP-Hosting Lifetime VPS 保活脚本')
+    commands = parser.add_subparsers(dest='command', metavar='命令')
+    commands.add_parser('run', help='处理全部账号 (默认)')
+    commands.add_parser('check', help='不启动浏览器检查配置、账号与会话状态')
+    commands.add_parser('sessions', help='列出会话目录中的全部会话')
+    commands.add_parser('daemon', help='启动常驻浏览器服务')
+    commands.add_parser('merge', help='汇总分片结果并发送通知')
+    args = parser.parse_args()
+    
+    if args.command == 'check':
+        return 0 if check_config() else 1
+    if args.command == 'sessions':
+        list_sessions()
+        return 0
+    if args.command == 'daemon':
+        asyncio.run(run_daemon())
+        return 0
+    if args.command == 'merge':
+        return 0 if merge_shard_results() else 1
+    return 0 if asyncio.run(main()) else 1
 
 
 if __name__ == '__main__':
-    result = asyncio.run(main())
-    exit(0 if result else 1)
+    exit(cli())